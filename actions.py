@@ -0,0 +1,133 @@
+# Computer-use action executor
+#
+# Maps the actions in the model's computer_call items (click, double_click,
+# scroll, type, keypress, wait, move, drag, screenshot) onto Playwright mouse
+# and keyboard calls, and builds the computer_call_output item that reports the
+# resulting screenshot back to the model.
+import base64
+
+from event_log import log_event
+from tracing import span
+
+# Key names used by the model -> Playwright key names
+KEY_MAP = {
+    "ENTER": "Enter",
+    "RETURN": "Enter",
+    "ESC": "Escape",
+    "ESCAPE": "Escape",
+    "TAB": "Tab",
+    "SPACE": "Space",
+    "BACKSPACE": "Backspace",
+    "DELETE": "Delete",
+    "CTRL": "Control",
+    "CONTROL": "Control",
+    "ALT": "Alt",
+    "OPTION": "Alt",
+    "SHIFT": "Shift",
+    "CMD": "Meta",
+    "META": "Meta",
+    "SUPER": "Meta",
+    "UP": "ArrowUp",
+    "DOWN": "ArrowDown",
+    "LEFT": "ArrowLeft",
+    "RIGHT": "ArrowRight",
+    "ARROWUP": "ArrowUp",
+    "ARROWDOWN": "ArrowDown",
+    "ARROWLEFT": "ArrowLeft",
+    "ARROWRIGHT": "ArrowRight",
+    "PAGEUP": "PageUp",
+    "PAGEDOWN": "PageDown",
+    "HOME": "Home",
+    "END": "End",
+}
+
+
+def to_playwright_key(key: str) -> str:
+    return KEY_MAP.get(key.upper(), key)
+
+
+async def execute_action(page, action, settle, scale: tuple = (1.0, 1.0)):
+    """Perform one computer_call action on the page.
+
+    scale maps the model's coordinates onto the page when its screenshots were downscaled.
+    """
+    kind = action.type
+    sx, sy = scale
+
+    def point(x, y):
+        return round(x * sx), round(y * sy)
+
+    with span("action", type=kind):
+        if kind == "click":
+            button = getattr(action, "button", "left")
+            if button == "back":
+                await page.go_back()
+            elif button == "forward":
+                await page.go_forward()
+            elif button == "wheel":
+                await page.mouse.move(*point(action.x, action.y))
+            else:
+                await page.mouse.click(*point(action.x, action.y), button=button)
+        elif kind == "double_click":
+            await page.mouse.dblclick(*point(action.x, action.y))
+        elif kind == "scroll":
+            await page.mouse.move(*point(action.x, action.y))
+            await page.mouse.wheel(*point(action.scroll_x, action.scroll_y))
+        elif kind == "type":
+            await page.keyboard.type(action.text)
+        elif kind == "keypress":
+            # Keys listed together are pressed as one combination, e.g. CTRL+A
+            await page.keyboard.press("+".join(to_playwright_key(key) for key in action.keys))
+        elif kind == "wait":
+            # Wait for the page to settle rather than for a fixed time
+            await settle.wait_for_settle()
+        elif kind == "move":
+            await page.mouse.move(*point(action.x, action.y))
+        elif kind == "drag":
+            path = action.path
+            await page.mouse.move(*point(path[0].x, path[0].y))
+            await page.mouse.down()
+            for step in path[1:]:
+                await page.mouse.move(*point(step.x, step.y))
+            await page.mouse.up()
+        elif kind == "screenshot":
+            # Every computer_call_output carries a fresh screenshot anyway
+            pass
+        else:
+            log_event(f"WARNING: Unsupported computer action: {kind}")
+
+
+def screenshot_data_url(screenshot: bytes, mime_type: str = "image/png") -> str:
+    return f"data:{mime_type};base64," + base64.b64encode(screenshot).decode("ascii")
+
+
+def pending_safety_checks(call) -> list:
+    return list(getattr(call, "pending_safety_checks", None) or [])
+
+
+def computer_call_output(call, screenshot: bytes, current_url: str, mime_type: str = "image/png",
+                         acknowledge_safety_checks: bool = False) -> dict:
+    """The input item that answers a computer_call with the screenshot taken after it ran.
+
+    The call's safety checks are only acknowledged when asked to; the caller decides whether the
+    action may run at all.
+    """
+    item = {
+        "type": "computer_call_output",
+        "call_id": call.call_id,
+        "output": {
+            "type": "input_image",
+            "image_url": screenshot_data_url(screenshot, mime_type),
+            "current_url": current_url,
+        },
+    }
+    # Safety checks must be acknowledged for the model to continue
+    checks = pending_safety_checks(call)
+    if checks and acknowledge_safety_checks:
+        for check in checks:
+            log_event(f"WARNING: Acknowledging safety check {check.code}: {check.message}")
+        item["acknowledged_safety_checks"] = [
+            {"id": check.id, "code": check.code, "message": check.message}
+            for check in checks
+        ]
+    return item
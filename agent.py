@@ -0,0 +1,955 @@
+# Async computer-use agent engine
+#
+# Every task runs in its own browser context inside one shared Chromium. Tasks
+# are scheduled concurrently with a limit, so while one task is waiting on the
+# model the others keep driving their pages.
+import asyncio
+import os
+import time
+from urllib.parse import urlparse
+
+from openai import AsyncAzureOpenAI
+from playwright.async_api import async_playwright
+
+from actions import computer_call_output, execute_action, pending_safety_checks, screenshot_data_url
+from artifacts import ArtifactStore
+from browser_pool import ContextPool, open_browser
+from completion import CompletionDetector
+from event_log import get_logger, log_event
+from metrics import Budget, MetricsWriter, TaskUsage, estimate_image_tokens, load_pricing
+from model_client import ResilientClient, make_http_client
+from model_input import ModelInputOptimizer
+from network import AssetCache, NetworkPolicy, install_routes
+from options import DEFAULT_MODEL, DEFAULT_VIEWPORT, validate_task
+import screenshots
+from tracing import span, start_task
+from response_cache import RecordingClient
+from selector_memory import SelectorMemory
+from probe import probe_selectors, best_match, winner_selector
+from settle import SettleDetector
+from speculation import Speculator
+
+# Candidate selectors for the search box
+SEARCH_BOX_SELECTORS = [
+    'input[name="q"]',
+    'input[type="search"]',
+    'input[type="text"]',
+    'input[aria-label*="search"]',
+    'input[aria-label*="Search"]',
+    '#sb_form_q',  # Specific Bing search box ID
+    '.b_searchbox',  # Bing search box class
+    '[name="q"]',  # Common search param
+    '#search_form',  # Bing search form
+    'form input'  # Any input in a form
+]
+
+# Candidate selectors for the search button
+SEARCH_BUTTON_SELECTORS = [
+    '#search_icon',  # Bing search icon
+    'button[type="submit"]',  # Generic submit button
+    'input[type="submit"]',  # Submit input
+    '#sb_form_go',  # Bing search button
+    '.search-button',  # Generic search button class
+    '[aria-label*="Search"]',  # Anything with search in aria-label
+    'svg[aria-label*="Search"]',  # SVG icon with search in aria-label
+    'button.b_searchboxSubmit'  # Bing specific submit button
+]
+
+async def take_screenshot(page, task: dict, name: str) -> bytes:
+    """Capture a screenshot of the page for this task; it is written in the background and the bytes returned."""
+    return await screenshots.get_capture().capture(page, task, name)
+
+
+# Draws the status message box in the top-right corner of the page
+OVERLAY_SCRIPT = '''message => {
+    // Remove existing overlay if any
+    const existingOverlay = document.getElementById('status-overlay');
+    if (existingOverlay) {
+        existingOverlay.remove();
+    }
+
+    // Create new overlay
+    const overlay = document.createElement('div');
+    overlay.id = 'status-overlay';
+    overlay.style.position = 'fixed';
+    overlay.style.top = '10px';
+    overlay.style.right = '10px';
+    overlay.style.backgroundColor = 'rgba(0, 0, 0, 0.8)';
+    overlay.style.color = 'white';
+    overlay.style.padding = '10px';
+    overlay.style.borderRadius = '5px';
+    overlay.style.zIndex = '9999';
+    overlay.style.maxWidth = '300px';
+    overlay.style.fontSize = '16px';
+    overlay.textContent = message;
+
+    document.body.appendChild(overlay);
+}'''
+
+
+# Function to show a status message on screen
+async def show_status_overlay(page, message):
+    try:
+        with span("overlay"):
+            await page.evaluate(OVERLAY_SCRIPT, message)
+    except Exception as e:
+        log_event(f"WARNING: Could not show overlay: {str(e)}")
+
+
+async def navigate_to_start(page, settle, task, timeout: float = 60.0):
+    """Open the task's start page, falling back to simpler navigation on failure."""
+    start_url = task["start_url"]
+    log_event(f"INFO: Navigating to {start_url}")
+    await show_status_overlay(page, f"Navigating to {start_url}...")
+
+    # Ensure navigation works by trying multiple approaches
+    try:
+        # Try basic navigation first
+        log_event("INFO: Trying basic navigation")
+        with span("navigation.goto", url=start_url, attempt=1):
+            await page.goto(start_url, wait_until="domcontentloaded", timeout=timeout * 1000)
+        log_event("INFO: Successfully navigated to start page")
+
+    except Exception as e:
+        log_event(f"WARNING: Issue with navigation: {str(e)}")
+        try:
+            # Try again with a different URL - the search page
+            log_event("INFO: Trying alternative navigation to the search page")
+            search_url = f"{start_url.rstrip('/')}/search"
+            with span("navigation.goto", url=search_url, attempt=2):
+                await page.goto(search_url, wait_until="domcontentloaded", timeout=timeout * 1000)
+            log_event("INFO: Navigated to the search page instead")
+
+        except Exception as e2:
+            log_event(f"WARNING: Alternative navigation failed: {str(e2)}")
+            # Try a simpler navigation as last resort
+            log_event("INFO: Trying simplified navigation")
+            with span("navigation.goto", url=start_url, attempt=3):
+                await page.goto(start_url, timeout=timeout * 1500)
+            log_event("INFO: Completed basic navigation")
+
+    # Let the page settle; unlike networkidle this ignores long-lived telemetry requests
+    log_event("INFO: Letting page settle")
+    if not await settle.wait_for_settle():
+        log_event("WARNING: Page did not fully settle before timeout")
+
+    # Try to ensure we have a valid page before proceeding
+    try:
+        page_title = await page.title()
+        log_event(f"INFO: Page title: {page_title}")
+        await show_status_overlay(page, f"Loaded page: {page_title}")
+    except Exception as e:
+        log_event(f"WARNING: Could not get page title: {str(e)}")
+
+
+async def probe_search_selectors(page, memory):
+    """Probe for the search box and button, trying the selectors remembered for this page first."""
+    page_url = page.url
+    cached_input = memory.lookup(page_url, "input") if memory else None
+    cached_button = memory.lookup(page_url, "button") if memory else None
+
+    if cached_input:
+        # Verify just the remembered selectors; a hit skips the full candidate list
+        try:
+            with span("prefill_probe", cached=True):
+                probe_results = await probe_selectors(page, {
+                    "input": [cached_input],
+                    "button": [cached_button] if cached_button else []
+                })
+            if best_match(probe_results["input"]):
+                log_event(f"INFO: Remembered search box selector '{cached_input}' is still valid")
+                if cached_button and not best_match(probe_results["button"]):
+                    memory.forget(page_url, "button")
+                    with span("prefill_probe", group="button"):
+                        probe_results["button"] = (await probe_selectors(page, {"button": SEARCH_BUTTON_SELECTORS}))["button"]
+                return probe_results
+            log_event(f"INFO: Remembered search box selector '{cached_input}' is no longer visible, probing all candidates")
+            memory.forget(page_url, "input")
+        except Exception as e:
+            log_event(f"WARNING: Remembered selector check failed: {str(e)}")
+
+    log_event(f"INFO: Probing {len(SEARCH_BOX_SELECTORS)} search box and {len(SEARCH_BUTTON_SELECTORS)} search button selectors in one round-trip")
+    # Send every candidate selector to the page at once and get back a ranked result per selector
+    with span("prefill_probe"):
+        return await probe_selectors(page, {
+            "input": SEARCH_BOX_SELECTORS,
+            "button": SEARCH_BUTTON_SELECTORS
+        })
+
+
+async def prefill_search(page, settle, task, memory=None):
+    """Find the search box, fill in the task's query and submit it; returns whether the search ran."""
+    logger = get_logger()
+    query = task["query"]
+    page_url = page.url
+    log_event("INFO: Starting search box detection and prefilling")
+
+    probe_results = {"input": [], "button": []}
+    try:
+        probe_results = await probe_search_selectors(page, memory)
+    except Exception as e:
+        log_event(f"WARNING: Selector probe failed: {str(e)}")
+
+    for result in probe_results["input"]:
+        if result.get("error"):
+            log_event(f"WARNING: Error checking selector '{result['selector']}': {result['error']}")
+
+    # Per-selector dumps are only built when DEBUG logging is on
+    if logger.enabled("DEBUG"):
+        for result in probe_results["input"]:
+            logger.debug("Selector check", kind="input", **result)
+        for result in probe_results["button"]:
+            logger.debug("Selector check", kind="button", **result)
+
+    # The probe tags the winning button, so later clicks target it directly
+    search_button_selector = None
+    best_button = best_match(probe_results["button"])
+    if best_button:
+        search_button_selector = winner_selector("button")
+        log_event(f"INFO: Found visible search button with selector: '{best_button['selector']}'")
+        if memory:
+            memory.record(page_url, "button", best_button["selector"])
+
+    # Take a screenshot to help debug
+    log_event("INFO: Taking screenshot of page before search box interaction")
+    await take_screenshot(page, task, "before_search_prefill")
+
+    # Now act on the winning search box directly
+    search_found = False
+    search_executed = False
+    used_selector = None
+    best_input = best_match(probe_results["input"])
+
+    if best_input:
+        target_selector = winner_selector("input")
+        try:
+            log_event(f"INFO: Trying to fill search box with selector: '{best_input['selector']}'")
+            await page.click(target_selector, timeout=5000)
+            log_event(f"INFO: Successfully clicked on '{best_input['selector']}'")
+
+            # fill() replaces any existing text, so no separate clear step is needed
+            await page.fill(target_selector, query)
+            log_event(f"INFO: Successfully filled '{best_input['selector']}' with '{query}'")
+
+            # Take a screenshot to verify
+            await take_screenshot(page, task, f"filled_search_with_{best_input['selector'].replace('[', '_').replace(']', '_').replace('*', '_')}")
+
+            search_found = True
+            used_selector = target_selector
+            if memory:
+                memory.record(page_url, "input", best_input["selector"])
+        except Exception as e:
+            log_event(f"WARNING: Failed to interact with '{best_input['selector']}': {str(e)}")
+            if memory:
+                memory.forget(page_url, "input")
+
+    # If we found the search box, highlight it
+    if search_found:
+        log_event(f"INFO: Successfully found and filled search box using selector: '{best_input['selector']}'")
+        await show_status_overlay(page, f"Found and filled search box with '{query}' using {best_input['selector']}")
+
+        try:
+            # Highlight the search box for visibility
+            await page.evaluate('''selector => {
+                const searchBox = document.querySelector(selector);
+                if (searchBox) {
+                    searchBox.style.border = '3px solid red';
+                    searchBox.style.boxShadow = '0 0 10px rgba(255, 0, 0, 0.7)';
+                    searchBox.scrollIntoView({ behavior: 'smooth', block: 'center' });
+                }
+            }''', used_selector)
+            log_event("INFO: Search box highlighted with red border")
+        except Exception as e:
+            log_event(f"WARNING: Could not highlight search box: {str(e)}")
+
+        # Take another screenshot with the highlighted search box
+        await take_screenshot(page, task, "prefilled_search_highlighted")
+
+        # Now try to execute the search by pressing Enter or clicking the search button
+        with span("submit"):
+            search_executed = await submit_search(page, settle, task, used_selector, search_button_selector)
+
+    else:
+        log_event("WARNING: Could not find or interact with any search box")
+        await show_status_overlay(page, "Search box not found for prefilling")
+
+        # Take a screenshot of the page in its current state
+        await take_screenshot(page, task, "search_box_not_found")
+
+        # As a last resort, try using JavaScript to find and fill a search input
+        try:
+            url_before_submit = page.url
+            await page.evaluate('''query => {
+                // Try to find ANY input that could be a search box
+                const inputs = Array.from(document.querySelectorAll('input'));
+                const searchBox = inputs.find(input =>
+                    input.type === 'text' ||
+                    input.type === 'search' ||
+                    input.name === 'q' ||
+                    input.placeholder?.toLowerCase().includes('search') ||
+                    input.ariaLabel?.toLowerCase().includes('search')
+                );
+
+                if (searchBox) {
+                    searchBox.value = query;
+                    searchBox.style.border = '3px solid red';
+                    searchBox.scrollIntoView({behavior: 'smooth', block: 'center'});
+                    console.log('Found and filled search box via JavaScript');
+
+                    // Try to submit the form
+                    const form = searchBox.closest('form');
+                    if (form) {
+                        setTimeout(() => {
+                            form.submit();
+                        }, 500);
+                    }
+
+                    return true;
+                }
+                return false;
+            }''', query)
+            log_event("INFO: Attempted JavaScript-based search box detection, filling and submission")
+            # Wait for the possible form submission
+            if await settle.wait_for_url_change(url_before_submit):
+                search_executed = True
+                await settle.wait_for_settle()
+            await take_screenshot(page, task, "javascript_search_attempt")
+        except Exception as e:
+            log_event(f"WARNING: JavaScript search attempt failed: {str(e)}")
+
+    return search_executed
+
+
+async def submit_search(page, settle, task, used_selector, search_button_selector):
+    """Execute the search by pressing Enter, clicking the search button or submitting the form; returns whether it ran."""
+    log_event("INFO: Attempting to execute search...")
+    search_executed = False
+    url_before_submit = page.url
+
+    # Method 1: Try pressing Enter on the search box
+    try:
+        log_event("INFO: Trying to press Enter on the search box")
+        await page.press(used_selector, "Enter")
+        log_event("INFO: Successfully pressed Enter on search box")
+        search_executed = True
+        await settle.wait_for_url_change(url_before_submit)  # Wait for search results to start loading
+        await take_screenshot(page, task, "after_enter_press")
+    except Exception as e:
+        log_event(f"WARNING: Failed to press Enter: {str(e)}")
+
+        # Method 2: Try clicking a search button if available
+        if search_button_selector:
+            try:
+                log_event(f"INFO: Trying to click search button with selector: '{search_button_selector}'")
+                await page.click(search_button_selector)
+                log_event("INFO: Successfully clicked search button")
+                search_executed = True
+                await settle.wait_for_url_change(url_before_submit)  # Wait for search results to start loading
+                await take_screenshot(page, task, "after_button_click")
+            except Exception as e:
+                log_event(f"WARNING: Failed to click search button: {str(e)}")
+
+        # Method 3: Try using JavaScript to submit the form
+        if not search_executed:
+            try:
+                log_event("INFO: Trying to submit form via JavaScript")
+                await page.evaluate('''() => {
+                    const searchBox = document.querySelector('input[type="search"], input[type="text"], #sb_form_q, [name="q"]');
+                    if (searchBox) {
+                        const form = searchBox.closest('form');
+                        if (form) {
+                            form.submit();
+                            return true;
+                        }
+                    }
+                    return false;
+                }''')
+                log_event("INFO: Attempted form submission via JavaScript")
+                await settle.wait_for_url_change(url_before_submit)  # Wait for search results to start loading
+                await take_screenshot(page, task, "after_js_submit")
+                search_executed = True
+            except Exception as e:
+                log_event(f"WARNING: Failed to submit form via JavaScript: {str(e)}")
+
+    if search_executed:
+        log_event("INFO: Search execution attempt completed")
+        # Wait for the results page to load
+        if await settle.wait_for_settle():
+            log_event("INFO: Search results page loaded")
+        else:
+            log_event("WARNING: Search results page did not settle before timeout")
+
+    return search_executed
+
+
+def build_steps(query: str) -> list:
+    """Prompts for each step of the task, sent one at a time as the model finishes the previous one."""
+    return [
+        # First step: If search wasn't executed automatically, help the agent complete it
+        f"""
+        Look at the browser. It should show a search box with '{query}' already typed in.
+        Steps:
+        1. Press Enter key or click the search button next to the search box
+        2. Wait for search results to load
+        That's all for this step.
+        """,
+        # Second step: focus on clicking a news article
+        f"""
+        Look at the search results for '{query}'.
+        Steps:
+        1. Find and click on any news article related to '{query}'
+        2. If you already clicked an article, scroll down to read more of it
+        """,
+    ]
+
+
+async def check_completion(page, detector: CompletionDetector) -> bool:
+    """Evaluate the task's goal on the page; False if the page can't be inspected right now."""
+    with span("completion_check"):
+        try:
+            reached, reasons, signals = await detector.check(page)
+        except Exception as e:
+            log_event(f"WARNING: Completion check failed: {str(e)}")
+            return False
+    log_event(f"INFO: Current URL: {signals['url']}")
+    if reached:
+        log_event(f"INFO: Task goal reached ({', '.join(reasons)})")
+    return reached
+
+
+async def run_computer_call(page, call, settle, scale: tuple):
+    """Execute one computer_call's action; a failed action is logged and the model sees the result."""
+    log_event(f"INFO: Executing {call.action.type} action")
+    try:
+        await execute_action(page, call.action, settle, scale=scale)
+    except Exception as e:
+        log_event(f"WARNING: Action {call.action.type} failed: {str(e)}")
+
+
+def computer_tool(display: dict) -> dict:
+    return {
+        "type": "computer_use_preview",
+        "display_width": display["width"],
+        "display_height": display["height"],
+        "environment": "browser"
+    }
+
+
+async def run_agent_loop(page, client, settle, task, max_iterations: int = 3, search_done: bool = False,
+                         optimizer: ModelInputOptimizer = None, detector: CompletionDetector = None,
+                         usage: TaskUsage = None, budget: Budget = None, speculator: Speculator = None,
+                         acknowledge_safety_checks: bool = False):
+    """Drive the computer-use model until the task looks complete or max_iterations is reached.
+
+    Each turn executes the model's computer_call actions on the page and answers them with a
+    screenshot, chained to the previous turn with previous_response_id so only the new items
+    are uploaded. Screenshots go through the optimizer, which may downscale them; the
+    model's coordinates are scaled back to the page when its actions are executed. Every
+    call goes to usage.model and is recorded in usage, and the budget is checked before each one. A speculator
+    observes the page while each call is in flight, for when the model asks for no actions.
+    A computer_call with pending safety checks (e.g. suspected prompt injection) stops the task
+    before its action runs, unless acknowledge_safety_checks is set.
+    """
+    logger = get_logger()
+    if optimizer is None:
+        optimizer = ModelInputOptimizer(DEFAULT_VIEWPORT)
+    if detector is None:
+        detector = CompletionDetector(task.get("goal"))
+    if usage is None:
+        usage = TaskUsage(task["id"], DEFAULT_MODEL, load_pricing())
+    if budget is None:
+        budget = Budget()
+    query = task["query"]
+
+    # Tools
+    tools = [computer_tool(optimizer.display)]
+    reasoning = {"generate_summary": "concise"}
+
+    # A task file may bring its own step prompts; "{query}" in them is replaced with the query
+    if task.get("steps"):
+        steps = [step.replace("{query}", query) for step in task["steps"]]
+        step_index = 0
+    else:
+        # The prefill already ran the search, so skip straight to the results step
+        steps = build_steps(query)
+        step_index = 1 if search_done else 0
+
+    # Variables for the loop; the goal may already be reached without any model call
+    task_completed = await check_completion(page, detector)
+    iteration = 0
+    previous_response_id = None
+    pending_outputs = []
+    computer_calls = []
+    screenshot = None
+    # The next frame, already encoded for the model by the speculator
+    next_frame = None
+    downgraded = False
+    aborted = None
+
+    # Continue until the task is completed or max iterations reached
+    while not task_completed and iteration < max_iterations:
+        # Stop, or switch to cheaper requests, before spending more on this task
+        decision, reason = budget.check(usage)
+        if decision == "abort":
+            log_event(f"WARNING: Stopping task: {reason}")
+            aborted = reason
+            break
+        if decision == "downgrade" and not downgraded:
+            log_event(f"WARNING: Downgrading model requests: {reason}")
+            downgraded = True
+            reasoning = None  # No reasoning summary
+            if optimizer.downgrade():
+                tools = [computer_tool(optimizer.display)]
+                if pending_outputs:
+                    # Resend the pending screenshot at the new, smaller size
+                    image, mime_type = await optimizer.prepare(screenshot, screenshots.get_capture().mime_type)
+                    pending_outputs = [computer_call_output(call, image, page.url, mime_type, acknowledge_safety_checks) for call in computer_calls]
+
+        # Answer outstanding computer calls first; otherwise move on to the next step's prompt
+        if pending_outputs:
+            input_items = pending_outputs
+            next_step = step_index
+        elif step_index < len(steps):
+            if screenshot is None:
+                screenshot = await take_screenshot(page, task, "initial_state")
+            prepared = optimizer.accept(next_frame) if next_frame is not None else None
+            next_frame = None
+            image, mime_type = prepared or await optimizer.prepare(screenshot, screenshots.get_capture().mime_type)
+            input_items = [{
+                "role": "user",
+                "content": [
+                    {"type": "input_text", "text": steps[step_index]},
+                    {"type": "input_image", "image_url": screenshot_data_url(image, mime_type)}
+                ]
+            }]
+            next_step = step_index + 1
+        else:
+            log_event("INFO: Agent finished all steps")
+            break
+
+        iteration += 1
+        logger.set_context(iteration=iteration)
+        log_event(f"INFO: Starting iteration {iteration}/{max_iterations}")
+        await show_status_overlay(page, f"Starting iteration {iteration}/{max_iterations}...")
+        await settle.pause(1)  # Pause to let the user see the message
+
+        log_event(f"INFO: Sending request to {usage.model} model (iteration {iteration})")
+        await show_status_overlay(page, f"Iteration {iteration}/{max_iterations}: Sending request to Computer Use agent...")
+        await settle.pause(2)  # Pause to let the user see the message
+
+        # A response whose actions ran on the page but whose calls are not answered yet
+        acted = None
+        try:
+            # Make the API call; other tasks keep running while this one awaits the model
+            await show_status_overlay(page, f"Iteration {iteration}/{max_iterations}: Agent is analyzing and controlling the browser...")
+            request = {
+                "model": usage.model,
+                "input": input_items,
+                "tools": tools,
+                "truncation": "auto"
+            }
+            if reasoning:
+                request["reasoning"] = reasoning
+            if previous_response_id:
+                request["previous_response_id"] = previous_response_id
+
+            url_before_actions = page.url
+            executed = set()
+            if getattr(client, "stream", False):
+                async def execute_streamed(item):
+                    # Start on each computer_call as soon as it has streamed in; one with safety
+                    # checks waits for the whole response, which decides whether it may run
+                    if item.type == "computer_call" and (acknowledge_safety_checks or not pending_safety_checks(item)):
+                        executed.add(item.call_id)
+                        await run_computer_call(page, item, settle, optimizer.scale)
+                request["on_output_item"] = execute_streamed
+
+            if speculator is not None:
+                # Capture, encode and warm connections while the model thinks
+                speculator.start(f"state_after_iteration_{iteration}")
+            call_started = time.monotonic()
+            with span("model_call", iteration=iteration):
+                response = await client.responses.create(**request)
+
+            # Record tokens, latency and cost from the response's usage
+            call_metrics = usage.record(response, time.monotonic() - call_started, iteration,
+                                        image_tokens=len(input_items) * estimate_image_tokens(**optimizer.display))
+            log_event(f"INFO: Model call took {call_metrics['latency_s']:.2f}s: {call_metrics['input_tokens']} input, {call_metrics['output_tokens']} output tokens, ${call_metrics['cost_usd']:.4f}")
+
+            log_event(f"INFO: Response received successfully (iteration {iteration})")
+            logger.debug("Response output", output=response.output)
+
+            await show_status_overlay(page, f"Iteration {iteration}/{max_iterations}: Agent response received! Processing...")
+            await settle.pause(2)  # Pause to let the user see the message
+
+            # Carry out the actions the model asked for, unless it flagged them itself
+            new_calls = [item for item in response.output if item.type == "computer_call"]
+            checks = [check for call in new_calls for check in pending_safety_checks(call)]
+            if checks and not acknowledge_safety_checks:
+                for check in checks:
+                    log_event(f"WARNING: Stopping task at safety check {check.code}: {check.message}")
+                aborted = f"safety check: {', '.join(check.code for check in checks)}"
+                await show_status_overlay(page, f"STOPPED: the model raised a safety check ({aborted})")
+                break
+            for call in new_calls:
+                if call.call_id not in executed:
+                    await run_computer_call(page, call, settle, optimizer.scale)
+            if new_calls:
+                acted = response
+                await settle.wait_for_settle()
+            if page.url != url_before_actions:
+                # A new page has nothing in common with the previous frame
+                optimizer.reset()
+
+            # Take screenshot after agent actions; the same bytes go back to the model. Without
+            # actions the page is as the speculator saw it, so its capture stands in
+            observation = None
+            if speculator is not None:
+                observation = await speculator.take(actions_ran=bool(new_calls))
+            if observation is not None:
+                log_event(f"INFO: Using the screenshot taken during iteration {iteration}")
+                screenshot = observation["screenshot"]
+                next_frame = observation["encoded"]
+            elif new_calls:
+                # Check the page itself for the goal state (only actions can change it) while capturing
+                log_event(f"INFO: Taking screenshot after iteration {iteration}")
+                screenshot, task_completed = await asyncio.gather(
+                    take_screenshot(page, task, f"state_after_iteration_{iteration}"),
+                    check_completion(page, detector))
+            else:
+                log_event(f"INFO: Taking screenshot after iteration {iteration}")
+                screenshot = await take_screenshot(page, task, f"state_after_iteration_{iteration}")
+            if new_calls:
+                image, mime_type = await optimizer.prepare(screenshot, screenshots.get_capture().mime_type)
+            outputs = [computer_call_output(call, image, page.url, mime_type, acknowledge_safety_checks) for call in new_calls]
+
+            # Only chain to this response once every computer_call in it has its output ready; if
+            # anything above failed, the next iteration retries the turn from the last complete one
+            previous_response_id = response.id
+            step_index = next_step
+            computer_calls = new_calls
+            pending_outputs = outputs
+            acted = None
+
+            if task_completed:
+                await show_status_overlay(page, "SUCCESS! News article opened!")
+            elif iteration == max_iterations:
+                log_event("INFO: Maximum iterations reached without completion")
+                await show_status_overlay(page, "Maximum iterations reached. Task may not be complete.")
+            else:
+                await show_status_overlay(page, f"Iteration {iteration} complete. Continuing search...")
+
+        except Exception as e:
+            log_event(f"ERROR: An error occurred in iteration {iteration}: {str(e)}")
+            await show_status_overlay(page, f"ERROR in iteration {iteration}: {str(e)[:50]}...")
+            # Take error screenshot
+            try:
+                error_screenshot = await take_screenshot(page, task, f"error_state_iteration_{iteration}")
+            except:
+                error_screenshot = None
+            if acted is not None and error_screenshot is not None:
+                # The actions already changed the page, so answer them with how it looks now rather
+                # than asking again from a frame the model has already acted on
+                try:
+                    new_calls = [item for item in acted.output if item.type == "computer_call"]
+                    image, mime_type = await optimizer.prepare(error_screenshot, screenshots.get_capture().mime_type)
+                    pending_outputs = [computer_call_output(call, image, page.url, mime_type, acknowledge_safety_checks) for call in new_calls]
+                    computer_calls = new_calls
+                    screenshot = error_screenshot
+                    previous_response_id = acted.id
+                    step_index = next_step
+                except Exception as e:
+                    log_event(f"WARNING: Could not answer the actions of iteration {iteration}: {str(e)}")
+            # Don't break the loop, try again with the next iteration if possible
+            await settle.pause(3)  # Let user see the error message
+
+    return {"completed": task_completed, "iterations": iteration, "cost": usage.cost, "usage": usage.totals(),
+            "aborted": aborted}
+
+
+async def run_task(pool, client, task, options, memory=None, pricing=None, metrics=None):
+    """Run one task in a clean browser context borrowed from the pool and return its result."""
+    logger = get_logger()
+    logger.set_context(task_id=task["id"], phase="setup")
+    result = {"task_id": task["id"], "completed": False, "iterations": 0, "cost": 0, "error": None, "aborted": None}
+    result["phases"] = start_task(task["id"])
+    started = time.monotonic()
+
+    # Token/cost accounting; the task's limits are set up inside the try, so a bad one only fails this task
+    usage = TaskUsage(task["id"], options.model, pricing or load_pricing(),
+                      fallback_cost=float(os.getenv("ESTIMATED_COST_PER_CALL", "0.0")))
+
+    capture = screenshots.get_capture()
+    store = capture.store
+    # Set up inside the try so the context always goes back to the pool; finally copes with what is still None
+    context = None
+    page = None
+    settle = None
+    speculator = None
+    trace_started = False
+
+    try:
+        # The limits this task must stay within (a task may set its own)
+        problems = validate_task(task)
+        if problems:
+            raise ValueError("; ".join(problems))
+        limits = {"max_tokens": options.max_task_tokens, "max_cost": options.max_task_cost,
+                  "max_seconds": options.max_task_seconds}
+        limits.update(task.get("budget", {}))
+        budget = Budget(**limits)
+
+        # Each task gets its own context (like a separate browser profile) in the shared browser
+        context = await pool.acquire()
+        page = context.pages[0]
+        store.begin_task(task["id"])
+        if options.playwright_trace:
+            await store.start_trace(context)
+            trace_started = True
+
+        # Waits on load/DOM/network signals instead of fixed sleeps
+        settle = SettleDetector(page, timeout=options.settle_timeout, fast=options.fast)
+
+        logger.set_context(phase="navigation")
+        with span("navigation"):
+            await navigate_to_start(page, settle, task, timeout=options.navigation_timeout)
+        # Wherever the start page redirected to; leaving this host means a result was opened
+        search_host = urlparse(page.url).hostname
+
+        logger.set_context(phase="prefill")
+        search_done = await prefill_search(page, settle, task, memory)
+
+        logger.set_context(phase="agent_loop")
+        # Downscales and re-encodes this task's screenshots before they go to the model
+        optimizer = ModelInputOptimizer(options.viewport, display=options.model_resolution,
+                                        crop_changes=options.model_crop_changes, min_psnr=options.model_min_psnr)
+        # Ends the loop as soon as the page shows the goal, judged locally from the DOM
+        detector = CompletionDetector(task.get("goal"), start_host=search_host)
+        # Pre-captures the next observation and preconnects to result hosts during model calls
+        if not options.no_speculation:
+            speculator = Speculator(page, task, optimizer, search_host=search_host)
+        max_iterations = task.get("max_iterations", options.max_iterations)
+        result.update(await run_agent_loop(page, client, settle, task, max_iterations, search_done,
+                                           optimizer, detector, usage, budget, speculator,
+                                           options.acknowledge_safety_checks))
+        log_event(f"INFO: Model input: {optimizer.bytes_in / 1024:.0f} KiB captured, {optimizer.bytes_out / 1024:.0f} KiB sent")
+        if speculator is not None:
+            log_event(f"INFO: Speculative captures: {speculator.used} used, {speculator.dropped} dropped, {len(speculator.preconnected)} hosts preconnected")
+
+        # Final summary
+        logger.set_context(phase="summary")
+        log_event(f"INFO: Process completed after {result['iterations']} iterations")
+        log_event(f"INFO: Total cost: ${result['cost']:.4f} for {usage.tokens} tokens")
+        log_event(f"INFO: Task completed successfully: {result['completed']}")
+
+        # Take a final screenshot
+        log_event("INFO: Taking final screenshot")
+        await take_screenshot(page, task, "final_state")
+
+        await show_status_overlay(page, f"Process completed! Iterations: {result['iterations']}, Cost: ${result['cost']:.4f}, Success: {result['completed']}")
+
+        # Longer pause to see the final state (10 seconds)
+        await settle.pause(10)
+
+    except Exception as e:
+        # One broken task must not take down the others sharing the browser
+        log_event(f"ERROR: A browser error occurred: {str(e)}")
+        result["error"] = str(e)
+        # Take error screenshot
+        try:
+            await take_screenshot(page, task, "error_state")
+            await show_status_overlay(page, f"ERROR: {str(e)[:100]}...")
+            await settle.pause(5)  # Let user see the error
+        except:
+            pass
+
+    finally:
+        failed = result["error"] is not None or not result["completed"]
+        if trace_started:
+            try:
+                await store.stop_trace(context, task["id"], failed)
+            except Exception as e:
+                log_event(f"WARNING: Could not save the Playwright trace: {str(e)}")
+        try:
+            await capture.finish_task(task["id"], failed)
+        except Exception as e:
+            log_event(f"WARNING: Could not store the task's artifacts: {str(e)}")
+        if settle is not None:
+            settle.detach()
+        if speculator is not None:
+            speculator.detach()
+        if context is not None:
+            log_event("INFO: Returning browser context to the pool")
+            await pool.release(context)
+
+    result["duration"] = time.monotonic() - started
+    result["cost"] = usage.cost
+    if metrics is not None:
+        task_record = {"type": "task", "task_id": task["id"], "completed": result["completed"],
+                       "iterations": result["iterations"], "aborted": result["aborted"], "error": result["error"],
+                       "duration_s": round(result["duration"], 3)}
+        task_record.update(usage.totals())
+        metrics.write(usage.calls + [task_record])
+    return result
+
+
+def make_model_client(options):
+    """Azure OpenAI client on a shared, tuned connection pool, with our own retries, hedging and streaming."""
+    http_client = make_http_client(max_connections=options.model_max_connections, timeout=options.model_timeout)
+    # The SDK's retries are replaced by ResilientClient's, which honour Retry-After with jitter
+    azure_client = AsyncAzureOpenAI(http_client=http_client, max_retries=0)
+    return ResilientClient(azure_client, max_retries=options.model_max_retries,
+                           hedge_percentile=options.model_hedge_percentile, stream=options.model_stream)
+
+
+class Engine:
+    """A browser, model client, context pool and capture service kept alive across runs.
+
+    Starting Playwright and the browser and opening the model client's connections costs more
+    than a short task, so in-process callers start an engine once and run tasks on it as often
+    as they like, also concurrently; options.concurrency bounds the tasks in flight across all
+    runs. Each engine stores its screenshots with its own capture service.
+
+        async with Engine(options) as engine:
+            results = await engine.run_tasks(tasks)
+
+    A client can be passed in (e.g. a stub for benchmarks); otherwise an Azure OpenAI client
+    is created, and closed with the engine. size is the number of browser contexts kept open,
+    options.concurrency by default.
+    """
+
+    def __init__(self, options, client=None, size: int = None):
+        self.options = options
+        self.client = client
+        self.size = options.concurrency if size is None else size
+        self._owns_client = client is None
+        self._playwright = None
+        self.browser = None
+        self.policy = None
+        self.cache = None
+        self.memory = None
+        self.capture = None
+        self.pricing = None
+        self.metrics = None
+        self.pool = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _make_client(self):
+        options = self.options
+        if self.client is not None:
+            log_event("INFO: Using the provided model client")
+            return self.client
+        log_event("INFO: Initializing Azure OpenAI client")
+        if options.model_cache == "off":
+            return make_model_client(options)
+        # Record responses to disk, or replay them and only go live on a cache miss
+        log_event(f"INFO: Model response cache in {options.model_cache} mode at {options.model_cache_dir}")
+        return RecordingClient(lambda: make_model_client(options), store_dir=options.model_cache_dir,
+                               mode=options.model_cache, match=options.model_cache_match,
+                               stream=options.model_stream)
+
+    async def start(self):
+        """Open the model client and the browser and pre-create the pool's contexts."""
+        options = self.options
+        try:
+            # One client for all tasks so they share its HTTP connection pool
+            self.client = self._make_client()
+
+            self._playwright = await async_playwright().start()
+            # Attach to the warm browser daemon if there is one, otherwise cold-launch
+            self.browser = await open_browser(self._playwright, headless=options.headless, endpoint=options.connect)
+            # Block heavy/ad requests and serve repeat static assets from disk in every context
+            self.policy = NetworkPolicy(options.block_resource_types, options.block_domains)
+            if options.asset_cache_dir:
+                self.cache = AssetCache(options.asset_cache_dir, max_bytes=options.asset_cache_max_mb * 1024 * 1024)
+
+            # Selectors that worked on earlier visits, tried before the full probe
+            if options.selector_memory:
+                self.memory = SelectorMemory(options.selector_memory, ttl=options.selector_memory_ttl_hours * 3600)
+
+            # Screenshots are written to the bounded artifact store on background threads; a
+            # Playwright trace records the frames instead when enabled
+            store = ArtifactStore(options.artifact_dir, layout=options.artifact_layout,
+                                  keep_last=options.artifact_keep_last,
+                                  only_on_failure=options.artifact_only_on_failure,
+                                  max_bytes=options.artifact_max_mb * 1024 * 1024)
+            self.capture = screenshots.CaptureService(store=store, image_format=options.screenshot_format,
+                                                      quality=options.screenshot_quality,
+                                                      dedup=not options.keep_duplicate_frames,
+                                                      keep_frames=not options.playwright_trace)
+
+            # Token pricing, and where per-call/per-task metrics go
+            self.pricing = load_pricing(options.pricing_file)
+            self.metrics = MetricsWriter(options.metrics_file) if options.metrics_file else None
+
+            # The pool size is the concurrency limit: a task waits until a context is free
+            self.pool = ContextPool(self.browser, size=self.size, viewport=options.viewport,
+                                    max_uses=options.context_max_uses, setup=self._setup_context)
+            await self.pool.start()
+        except BaseException:
+            await self.close()
+            raise
+
+    async def _setup_context(self, context):
+        await install_routes(context, self.policy, self.cache)
+
+    async def run_tasks(self, tasks, on_result=None) -> list:
+        """Run tasks concurrently in the engine's browser and return their results in order.
+
+        on_result(result) is called as each task finishes, before the whole batch is done.
+        """
+        async def run_and_report(task):
+            result = await run_task(self.pool, self.client, task, self.options, self.memory, self.pricing,
+                                    self.metrics)
+            if on_result is not None:
+                on_result(result)
+            return result
+
+        with screenshots.using(self.capture):
+            return await asyncio.gather(*(run_and_report(task) for task in tasks))
+
+    async def close(self):
+        """Close everything start() opened; safe to call after a failed start."""
+        options = self.options
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
+        if self.capture is not None:
+            await self.capture.close()
+            self.capture = None
+        if self.policy is not None:
+            log_event(f"INFO: Blocked {self.policy.blocked} requests")
+            self.policy = None
+        if self.memory is not None:
+            self.memory.save()
+            self.memory = None
+        if self.cache is not None:
+            self.cache.save()
+            log_event(f"INFO: Asset cache: {self.cache.hits} hits, {self.cache.misses} misses, {self.cache.bytes_served / 1024:.0f} KiB served from disk")
+            self.cache = None
+        if self._owns_client and self.client is not None:
+            await self.client.close()
+            self.client = None
+        # A warm browser is shared with other runs, so only close one we launched ourselves
+        if self.browser is not None:
+            if not options.connect:
+                log_event("INFO: Closing browser")
+                await self.browser.close()
+            self.browser = None
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+
+async def run_tasks(tasks, options, client=None, on_result=None):
+    """Run tasks concurrently, at most options.concurrency at a time, in one shared browser.
+
+    Starts an Engine for just these tasks; see Engine for running several batches on one.
+    """
+    async with Engine(options, client=client, size=min(options.concurrency, len(tasks))) as engine:
+        return await engine.run_tasks(tasks, on_result=on_result)
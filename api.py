@@ -0,0 +1,190 @@
+# In-process API
+#
+# Runs tasks from Python without going through the command line or a new
+# process: build an options.Config (or options.finalize() a parsed command
+# line) and call run_task() or run_tasks(). Playwright and the OpenAI SDK are
+# imported only when a task actually runs (asyncio too, which alone takes
+# longer to import than everything else here), so importing this module,
+# building a Config and checking it stay cheap.
+#
+#   from api import Config, run_task
+#   result = run_task(Config(headless=True, fast=True, max_iterations=2), "AI news")
+#   print(result.completed, result.cost)
+#
+# run_task() and run_tasks() start and stop the browser around every call. To
+# run many tasks over time, keep a Session open instead; its browser, model
+# client and screenshot writers are reused by every call:
+#
+#   async with Session(config) as session:
+#       first = await session.run_task("AI news")
+#       more = await session.run_tasks(["Python 3.13", "Rust 2024"])
+import importlib.util
+import os
+from dataclasses import dataclass, field, fields
+
+from options import Config, validate_task
+
+# Module -> the package that provides it, for every third-party module the engine and the
+# command-line entry points import when tasks run; check() only looks for them. Pillow is
+# optional and only makes screenshots smaller.
+REQUIRED_MODULES = {
+    "playwright": "playwright",
+    "openai": "openai",
+    "dotenv": "python-dotenv",
+}
+
+# Options that only work with Pillow installed; without it the engine falls back and logs a warning
+def pillow_options(config: Config) -> list:
+    """The options set in config that need Pillow."""
+    needed = []
+    if config.model_resolution is not None and config.model_resolution != config.viewport:
+        needed.append("model_resolution")
+    if config.model_crop_changes:
+        needed.append("model_crop_changes")
+    if config.screenshot_format == "webp":
+        needed.append("screenshot_format=webp")
+    if config.model_cache_match == "perceptual":
+        needed.append("model_cache_match=perceptual")
+    return needed
+
+
+# Read by AsyncAzureOpenAI
+REQUIRED_ENVIRONMENT = ("AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_KEY", "OPENAI_API_VERSION")
+
+
+@dataclass
+class Result:
+    """Outcome of one task."""
+
+    task_id: str
+    completed: bool = False
+    iterations: int = 0
+    cost: float = 0.0
+    duration: float = 0.0
+    # Budget or safety check that stopped the task, or the error that ended it
+    aborted: str = None
+    error: str = None
+    usage: dict = field(default_factory=dict)
+    phases: list = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, result: dict) -> "Result":
+        return cls(**{spec.name: result[spec.name] for spec in fields(cls) if spec.name in result})
+
+
+def make_task(task, config: Config, number: int = 1) -> dict:
+    """A task dict from a query string or a (partial) task dict; ValueError if its own options are invalid."""
+    if isinstance(task, str):
+        task = {"query": task}
+    task = dict(task)
+    problems = validate_task(task)
+    if problems:
+        raise ValueError(f"Task {task.get('id', number)}: {'; '.join(problems)}")
+    task.setdefault("id", f"task{number}")
+    task.setdefault("start_url", config.start_url)
+    return task
+
+
+def missing_environment(config: Config) -> list:
+    """Environment variables the live model client needs but that are not set."""
+    # Replaying recorded responses may not need the live model at all
+    if config.model_cache == "replay":
+        return []
+    return [name for name in REQUIRED_ENVIRONMENT if not os.getenv(name)]
+
+
+def check(config: Config) -> list:
+    """Everything that would stop a run, as messages, without importing or launching anything."""
+    problems = config.validate()
+    for module, package in REQUIRED_MODULES.items():
+        if importlib.util.find_spec(module) is None:
+            problems.append(f"Python package {package} is not installed")
+    if importlib.util.find_spec("PIL") is None:
+        problems.extend(f"{option} needs the Python package Pillow, which is not installed"
+                        for option in pillow_options(config))
+    problems.extend(f"{name} is not set" for name in missing_environment(config))
+    if config.pricing_file and not os.path.exists(config.pricing_file):
+        problems.append(f"Pricing file {config.pricing_file} does not exist")
+    return problems
+
+
+class Session:
+    """A running engine (browser, model client, screenshot writers) reused by every call.
+
+    Calls may overlap; config.concurrency bounds the tasks in flight across all of them.
+    size is the number of browser contexts kept open, config.concurrency by default.
+    """
+
+    def __init__(self, config: Config, client=None, size: int = None):
+        problems = config.validate()
+        if problems:
+            raise ValueError("; ".join(problems))
+        self.config = config
+        self.client = client
+        self.size = size
+        self._engine = None
+        # Default task ids keep counting across calls, so they stay unique within the session
+        self._numbers = 0
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        from agent import Engine
+
+        engine = Engine(self.config, client=self.client, size=self.size)
+        await engine.start()
+        self._engine = engine
+
+    async def close(self):
+        if self._engine is not None:
+            engine, self._engine = self._engine, None
+            await engine.close()
+
+    async def run_tasks(self, tasks, on_result=None) -> list:
+        """Run tasks (queries or task dicts) and return their Results in order."""
+        if self._engine is None:
+            raise RuntimeError("Session is not started; use it with async with, or call start() first")
+        prepared = []
+        for task in tasks:
+            self._numbers += 1
+            prepared.append(make_task(task, self.config, self._numbers))
+        report = None
+        if on_result is not None:
+            def report(result):
+                on_result(Result.from_dict(result))
+        results = await self._engine.run_tasks(prepared, on_result=report)
+        return [Result.from_dict(result) for result in results]
+
+    async def run_task(self, task="AI news") -> Result:
+        """Run one task (a query or a task dict) and return its Result."""
+        results = await self.run_tasks([task])
+        return results[0]
+
+
+async def run_tasks_async(config: Config, tasks, client=None, on_result=None) -> list:
+    """Run tasks (queries or task dicts) in the current event loop, in a Session of their own."""
+    tasks = list(tasks)
+    async with Session(config, client=client, size=min(config.concurrency, len(tasks))) as session:
+        return await session.run_tasks(tasks, on_result=on_result)
+
+
+async def run_task_async(config: Config, task="AI news", client=None) -> Result:
+    results = await run_tasks_async(config, [task], client=client)
+    return results[0]
+
+
+def run_tasks(config: Config, tasks, client=None, on_result=None) -> list:
+    """Run tasks (queries or task dicts) with their own event loop and browser, and return their Results."""
+    import asyncio
+    return asyncio.run(run_tasks_async(config, tasks, client=client, on_result=on_result))
+
+
+def run_task(config: Config, task="AI news", client=None) -> Result:
+    """Run one task (a query or a task dict) and return its Result."""
+    import asyncio
+    return asyncio.run(run_task_async(config, task, client=client))
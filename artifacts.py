@@ -0,0 +1,225 @@
+# Bounded artifact store
+#
+# Screenshots and traces are kept per task under one root directory instead of
+# as loose files in the working directory: either a directory per task or, once
+# the task is finished, a single zip archive per task. Each task keeps at most
+# its last N frames (a ring buffer), or keeps frames in memory and only writes
+# them out if the task failed. The whole store is capped in size; when a
+# finished task pushes it over, the least recently written task artifacts are
+# evicted first. Alternatively a Playwright trace (screenshots and DOM
+# snapshots) per task replaces the individual frames. Batch workers share the
+# root, so a running task also leaves a <task>.running marker there, and no
+# process evicts a task another one is still running.
+import os
+import re
+import shutil
+import threading
+import zipfile
+from collections import deque
+
+from event_log import log_event
+
+# Marks a task as running, in whichever process, so its artifacts are never evicted from under it
+RUNNING_SUFFIX = ".running"
+
+
+def _safe_name(name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "frame"
+
+
+def _process_alive(pid: int) -> bool:
+    if os.name != "posix":
+        # No harmless way to probe another process here; its marker is honoured until it finishes
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+def _size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(directory, file_name))
+                   for directory, _, file_names in os.walk(path) for file_name in file_names)
+    return os.path.getsize(path)
+
+
+class ArtifactStore:
+    """Per-task artifact directories or archives with ring-buffer retention and a global size cap.
+
+    add() and finish_task() are called from the screenshot writer threads.
+    """
+
+    def __init__(self, root: str = ".artifacts", layout: str = "dir", keep_last: int = 0,
+                 only_on_failure: bool = False, max_bytes: int = 500 * 1024 * 1024):
+        self.root = root
+        self.layout = layout
+        # 0 keeps every frame
+        self.keep_last = keep_last
+        self.only_on_failure = only_on_failure
+        self.max_bytes = max_bytes
+        self.evicted = 0
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        # Task id -> frame file names on disk (or (name, bytes) held back until the task fails)
+        self._frames = {}
+        self._sequence = {}
+
+    def task_dir(self, task_id: str) -> str:
+        return os.path.join(self.root, _safe_name(task_id))
+
+    def trace_path(self, task_id: str) -> str:
+        return os.path.join(self.root, f"{_safe_name(task_id)}.trace.zip")
+
+    def marker_path(self, task_id: str) -> str:
+        return os.path.join(self.root, f"{_safe_name(task_id)}{RUNNING_SUFFIX}")
+
+    def begin_task(self, task_id: str):
+        """Register a running task; its artifacts are never evicted while it runs, by any process."""
+        with self._lock:
+            self._frames.setdefault(task_id, deque())
+            self._sequence.setdefault(task_id, 0)
+        with open(self.marker_path(task_id), "w", encoding="utf-8") as f:
+            f.write(str(os.getpid()))
+
+    def _end_task(self, task_id: str):
+        try:
+            os.remove(self.marker_path(task_id))
+        except OSError:
+            pass
+
+    def _running_elsewhere(self, entry: str) -> bool:
+        # Whether a marker belongs to a task that is still running; markers of dead processes are removed
+        path = os.path.join(self.root, entry)
+        try:
+            with open(path, encoding="utf-8") as f:
+                pid = int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return True
+        if not pid or _process_alive(pid):
+            return True
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+        return False
+
+    def add(self, task_id: str, name: str, extension: str, data: bytes):
+        """Store one frame; the oldest frame is dropped once the task has more than keep_last."""
+        with self._lock:
+            frames = self._frames.setdefault(task_id, deque())
+            sequence = self._sequence.get(task_id, 0) + 1
+            self._sequence[task_id] = sequence
+            file_name = f"{sequence:03d}_{_safe_name(name)}.{extension}"
+            frames.append((file_name, data) if self.only_on_failure else file_name)
+            dropped = frames.popleft() if self.keep_last and len(frames) > self.keep_last else None
+        if self.only_on_failure:
+            return
+
+        self._write(task_id, file_name, data)
+        with self._lock:
+            superseded = file_name not in frames
+        # Another writer thread may have pushed this frame out of the ring while it was written
+        if superseded:
+            self._remove(task_id, file_name)
+        if dropped is not None:
+            self._remove(task_id, dropped)
+
+    def _remove(self, task_id: str, file_name: str):
+        try:
+            os.remove(os.path.join(self.task_dir(task_id), file_name))
+        except OSError:
+            pass
+
+    def _write(self, task_id: str, file_name: str, data: bytes):
+        directory = self.task_dir(task_id)
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, file_name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def keeps(self, failed: bool) -> bool:
+        """Whether a task that ended this way keeps its artifacts."""
+        return failed or not self.only_on_failure
+
+    def finish_task(self, task_id: str, failed: bool):
+        """Write out held-back frames if needed, archive the task and enforce the size cap."""
+        with self._lock:
+            frames = self._frames.pop(task_id, deque())
+            self._sequence.pop(task_id, None)
+        try:
+            if self.only_on_failure:
+                if not failed:
+                    return
+                for file_name, data in frames:
+                    self._write(task_id, file_name, data)
+
+            directory = self.task_dir(task_id)
+            if self.layout == "zip" and os.path.isdir(directory):
+                # Frames are PNG/JPEG/WebP and already compressed, so store them as they are
+                archive_path = f"{directory}.zip"
+                with zipfile.ZipFile(f"{archive_path}.tmp", "w", compression=zipfile.ZIP_STORED) as archive:
+                    for file_name in sorted(os.listdir(directory)):
+                        archive.write(os.path.join(directory, file_name), file_name)
+                os.replace(f"{archive_path}.tmp", archive_path)
+                shutil.rmtree(directory, ignore_errors=True)
+        finally:
+            self._end_task(task_id)
+        self.enforce_cap()
+
+    def enforce_cap(self):
+        """Evict the least recently written artifacts of finished tasks until the store fits in max_bytes.
+
+        Tasks still running in this or any other process sharing the root are never evicted.
+        """
+        if not self.max_bytes:
+            return
+        with self._lock:
+            active = {_safe_name(task_id) for task_id in self._frames}
+        listing = os.listdir(self.root)
+        active.update(entry[:-len(RUNNING_SUFFIX)] for entry in listing
+                      if entry.endswith(RUNNING_SUFFIX) and self._running_elsewhere(entry))
+        entries = []
+        total = 0
+        for entry in listing:
+            if entry.endswith(RUNNING_SUFFIX):
+                continue
+            path = os.path.join(self.root, entry)
+            try:
+                size = _size(path)
+                modified = os.path.getmtime(path)
+            except OSError:
+                continue
+            total += size
+            task_name = entry.split(".", 1)[0] if os.path.isfile(path) else entry
+            if task_name not in active and not entry.endswith(".tmp"):
+                entries.append((modified, path, size))
+
+        for modified, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+            total -= size
+            self.evicted += 1
+            log_event(f"INFO: Evicted {path} to keep artifacts under {self.max_bytes / 1024 / 1024:.0f} MiB")
+
+    async def start_trace(self, context):
+        """Record a Playwright trace of the context instead of separate frames."""
+        await context.tracing.start(screenshots=True, snapshots=True)
+
+    async def stop_trace(self, context, task_id: str, failed: bool):
+        if self.keeps(failed):
+            await context.tracing.stop(path=self.trace_path(task_id))
+        else:
+            await context.tracing.stop()
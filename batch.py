@@ -0,0 +1,169 @@
+# Sharded batch runner
+#
+# Reads tasks from a JSON Lines file and spreads them round-robin across a pool
+# of worker processes. Each worker launches its own browser and runs its shard
+# with the usual async engine (--concurrency contexts at a time), so a batch
+# can use every core. Results stream back to the parent as each task finishes
+# and are appended to an output JSON Lines file. A checkpoint file records
+# every finished task id, so an interrupted batch picks up where it stopped.
+#
+#   python batch.py --tasks tasks.jsonl --output results.jsonl --workers 8 --headless
+#
+# One task per line; only "query" is required:
+#   {"id": "t1", "start_url": "https://www.bing.com", "query": "AI news",
+#    "steps": ["Search for '{query}'", "Open a news article about '{query}'"],
+#    "goal": {"match": "any", "article": 500}, "budget": {"max_cost": 0.5}, "max_iterations": 5}
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+
+import event_log
+import options
+from event_log import log_event
+
+TASK_FIELDS = {"id", "start_url", "query", "steps", "goal", "budget", "max_iterations"}
+
+
+def load_tasks(path: str, default_start_url: str) -> list:
+    """Parse the task file; ids default to the line number."""
+    tasks = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            task = json.loads(line)
+            unknown = set(task) - TASK_FIELDS
+            if unknown:
+                raise ValueError(f"{path}:{number}: unknown task fields: {', '.join(sorted(unknown))}")
+            if "query" not in task:
+                raise ValueError(f"{path}:{number}: task has no query")
+            problems = options.validate_task(task)
+            if problems:
+                raise ValueError(f"{path}:{number}: {'; '.join(problems)}")
+            task["id"] = str(task.get("id", f"task{number}"))
+            task.setdefault("start_url", default_start_url)
+            tasks.append(task)
+    ids = [task["id"] for task in tasks]
+    if len(set(ids)) != len(ids):
+        raise ValueError(f"{path}: task ids must be unique")
+    return tasks
+
+
+def load_checkpoint(path: str) -> dict:
+    """Task id -> whether it finished with an error, for every task already done."""
+    done = {}
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A line cut short by the interruption
+                continue
+            done[entry["task_id"]] = entry["error"]
+    return done
+
+
+def shard(tasks: list, count: int) -> list:
+    """Split tasks round-robin into at most count non-empty shards."""
+    shards = [tasks[index::count] for index in range(count)]
+    return [part for part in shards if part]
+
+
+def worker_log_path(log_file: str, index: int) -> str:
+    root, extension = os.path.splitext(log_file)
+    return f"{root}.worker{index}{extension}"
+
+
+def _run_shard(index: int, tasks: list, config, results):
+    # Runs in a worker process with its own event loop, browser and log file
+    from agent import run_tasks
+
+    logger = event_log.configure(path=worker_log_path(config.log_file, index), level=config.log_level, console=False,
+                                 flush_interval=config.log_flush_interval, max_bytes=config.log_max_bytes)
+    log_event(f"INFO: Worker {index} running {len(tasks)} tasks")
+    try:
+        asyncio.run(run_tasks(tasks, config, on_result=results.put))
+    finally:
+        logger.close()
+    return len(tasks)
+
+
+def run_batch(tasks: list, config, workers: int, output_path: str, checkpoint_path: str) -> list:
+    """Run tasks across worker processes, streaming each result to the output and checkpoint files."""
+    shards = shard(tasks, workers)
+    finished = []
+    # spawn, not fork: the parent already runs the log writer thread
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager, ProcessPoolExecutor(max_workers=len(shards), mp_context=context) as pool:
+        results = manager.Queue()
+        futures = [pool.submit(_run_shard, index, part, config, results) for index, part in enumerate(shards)]
+        with open(output_path, "a", encoding="utf-8") as output, open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+            while True:
+                try:
+                    result = results.get(timeout=1)
+                except queue.Empty:
+                    # Workers put every result before they return, so once all are done the queue is drained
+                    if all(future.done() for future in futures):
+                        break
+                    continue
+                result.pop("phases", None)
+                output.write(json.dumps(result, default=str) + "\n")
+                output.flush()
+                # Only checkpoint once the result itself is safely written
+                checkpoint.write(json.dumps({"task_id": result["task_id"], "error": result["error"] is not None}) + "\n")
+                checkpoint.flush()
+                finished.append(result)
+                log_event(f"INFO: {result['task_id']}: completed={result['completed']}, iterations={result['iterations']}, cost=${result['cost']:.4f}, duration={result['duration']:.1f}s ({len(finished)}/{len(tasks)})")
+
+        for index, future in enumerate(futures):
+            if future.exception() is not None:
+                log_event(f"ERROR: Worker {index} failed: {str(future.exception())}")
+    return finished
+
+
+# Command line options
+parser = options.build_parser("Run a task file across several worker processes")
+parser.add_argument("--tasks", required=True,
+                    help="JSON Lines file with one task per line")
+parser.add_argument("--output", default="results.jsonl",
+                    help="JSON Lines file results are appended to as tasks finish")
+parser.add_argument("--checkpoint",
+                    help="File recording finished task ids for resuming (default: OUTPUT.checkpoint)")
+parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                    help="Worker processes, each with its own browser")
+parser.add_argument("--retry-errors", action="store_true",
+                    help="On resume, run tasks that finished with an error again")
+
+if __name__ == "__main__":
+    load_dotenv()
+    args = parser.parse_args()
+    config = options.finalize(args)
+    args.checkpoint = args.checkpoint or f"{args.output}.checkpoint"
+    logger = event_log.configure(path=config.log_file, level=config.log_level,
+                                 flush_interval=config.log_flush_interval, max_bytes=config.log_max_bytes)
+    try:
+        tasks = load_tasks(args.tasks, config.start_url)
+        done = load_checkpoint(args.checkpoint)
+        pending = [task for task in tasks
+                   if task["id"] not in done or (args.retry_errors and done[task["id"]])]
+        log_event(f"INFO: {len(tasks)} tasks, {len(tasks) - len(pending)} already done, running {len(pending)} on {args.workers} workers")
+
+        if pending:
+            started = time.monotonic()
+            finished = run_batch(pending, config, args.workers, args.output, args.checkpoint)
+            elapsed = time.monotonic() - started
+            completed = sum(1 for result in finished if result["completed"])
+            log_event(f"INFO: {completed}/{len(finished)} tasks completed in {elapsed:.1f}s ({len(finished) / elapsed * 60:.2f} tasks/minute)")
+            if len(finished) < len(pending):
+                log_event(f"WARNING: {len(pending) - len(finished)} tasks did not finish; run again to resume")
+    finally:
+        logger.close()
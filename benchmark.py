@@ -0,0 +1,211 @@
+# Offline benchmark for the agent loop
+#
+# Runs the real agent engine many times against the local fixture site with
+# the stub model client (or, with --fake-server, the real openai client and the
+# resilient wrapper against a local fake endpoint), then reports per-phase
+# latency percentiles (navigation, prefill probe, submit, model call,
+# screenshot, completion check) as JSON so results can be compared across
+# commits. Needs no network access.
+#
+#   python benchmark.py --runs 50 --concurrency 4 --output bench.json
+import argparse
+import asyncio
+import json
+import subprocess
+import sys
+import time
+
+from openai import AsyncAzureOpenAI
+
+import event_log
+import tracing
+from agent import run_tasks
+from fake_model import FakeModelClient
+from fake_model_server import FakeModelServer
+from fixture_site import FixtureSite
+from model_client import ResilientClient, make_http_client
+from options import SCREENSHOT_FORMATS, Config, parse_resolution
+
+# Any version the client accepts; the fake endpoint ignores it
+FAKE_API_VERSION = "2025-03-01-preview"
+
+PHASES = ["navigation", "prefill_probe", "submit", "model_call", "screenshot", "completion_check"]
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Linearly interpolated percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+def summarize(samples: list) -> dict:
+    """Latency statistics in milliseconds."""
+    values = sorted(seconds * 1000 for seconds in samples)
+    return {
+        "count": len(values),
+        "mean_ms": sum(values) / len(values) if values else 0.0,
+        "p50_ms": percentile(values, 50),
+        "p90_ms": percentile(values, 90),
+        "p95_ms": percentile(values, 95),
+        "p99_ms": percentile(values, 99),
+        "max_ms": values[-1] if values else 0.0,
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+async def run_benchmark(args) -> dict:
+    """Run args.runs fixture tasks and return the benchmark report."""
+    with FixtureSite() as site:
+        # Engine defaults, except where the benchmark needs something else
+        options = Config(
+            concurrency=args.concurrency,
+            max_iterations=args.max_iterations,
+            headless=True,
+            connect=args.connect,
+            context_max_uses=args.context_max_uses,
+            fast=True,
+            settle_timeout=args.settle_timeout,
+            no_speculation=args.no_speculation,
+            block_resource_types=[],
+            block_domains=[],
+            asset_cache_dir=args.asset_cache_dir,
+            selector_memory=args.selector_memory,
+            artifact_dir=args.artifact_dir,
+            artifact_max_mb=0,
+            playwright_trace=args.playwright_trace,
+            screenshot_format=args.screenshot_format,
+            model_resolution=args.model_resolution,
+            model_crop_changes=args.model_crop_changes,
+            metrics_file=args.metrics_file,
+            model_hedge_percentile=args.hedge_percentile,
+            model_stream=args.stream,
+        )
+        tasks = [
+            {"id": f"bench{i}", "start_url": site.url, "query": "AI news"}
+            for i in range(1, args.runs + 1)
+        ]
+        server = None
+        if args.fake_server:
+            # Real HTTP round trips, with throttling and slow responses on a schedule
+            server = FakeModelServer(latency=args.model_latency, throttle_every=args.throttle_every,
+                                     retry_after=0.5, slow_every=args.slow_every).start()
+            azure_client = AsyncAzureOpenAI(azure_endpoint=server.url, api_key="fake", api_version=FAKE_API_VERSION,
+                                            http_client=make_http_client(), max_retries=0)
+            client = ResilientClient(azure_client, hedge_percentile=args.hedge_percentile, stream=args.stream)
+        else:
+            client = FakeModelClient(latency=args.model_latency)
+
+        started = time.monotonic()
+        try:
+            results = await run_tasks(tasks, options, client=client)
+        finally:
+            elapsed = time.monotonic() - started
+            if server is not None:
+                await client.close()
+                server.stop()
+
+    by_phase = {name: [] for name in PHASES}
+    for result in results:
+        for name, seconds in result["phases"]:
+            by_phase.setdefault(name, []).append(seconds)
+    task_durations = [result["duration"] for result in results]
+
+    report = {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "runs": len(results),
+        "concurrency": args.concurrency,
+        "model_latency_s": args.model_latency,
+        "completed": sum(1 for result in results if result["completed"]),
+        "errors": sum(1 for result in results if result["error"]),
+        "model_calls": server.requests if server is not None else client.calls,
+        "wall_time_s": elapsed,
+        "tasks_per_minute": len(results) / elapsed * 60 if elapsed else 0.0,
+        "task": summarize(task_durations),
+        "phases": {name: summarize(samples) for name, samples in by_phase.items()},
+    }
+    if server is not None:
+        report["model_client"] = {"throttled": server.throttled, "retries": client.retries, "hedged": client.hedged}
+    return report
+
+
+# Command line options
+parser = argparse.ArgumentParser(description="Benchmark the agent against a local fixture site and a stub model")
+parser.add_argument("--runs", type=int, default=20,
+                    help="Number of tasks to run")
+parser.add_argument("--concurrency", type=int, default=1,
+                    help="Maximum number of tasks running at once")
+parser.add_argument("--max-iterations", type=int, default=3,
+                    help="Maximum model calls per task")
+parser.add_argument("--model-latency", type=float, default=0.0,
+                    help="Simulated seconds the stub model takes per call")
+parser.add_argument("--settle-timeout", type=float, default=5.0,
+                    help="Maximum seconds to wait for the page to settle")
+parser.add_argument("--no-speculation", action="store_true",
+                    help="Capture after each model call instead of speculatively during it, for comparison")
+parser.add_argument("--connect", metavar="ENDPOINT",
+                    help="Attach to a warm browser started by browser_daemon.py")
+parser.add_argument("--context-max-uses", type=int, default=20,
+                    help="Recycle a pooled browser context after this many tasks")
+parser.add_argument("--asset-cache-dir", default="",
+                    help="Serve fixture static assets from this persistent cache (off by default)")
+parser.add_argument("--selector-memory", default="",
+                    help="Remember winning selectors in this file to benchmark the cached probe path")
+parser.add_argument("--artifact-dir", default="benchmark_artifacts",
+                    help="Directory the benchmarked screenshots are written to")
+parser.add_argument("--playwright-trace", action="store_true",
+                    help="Record a Playwright trace per task instead of separate frames")
+parser.add_argument("--screenshot-format", default="png", choices=SCREENSHOT_FORMATS,
+                    help="Image format for screenshots")
+parser.add_argument("--model-resolution", type=parse_resolution, default="", metavar="WIDTHxHEIGHT",
+                    help="Downscale screenshots to this size before sending them to the model")
+parser.add_argument("--model-crop-changes", action="store_true",
+                    help="Only send the region that changed since the previous screenshot")
+parser.add_argument("--metrics-file", default="",
+                    help="Also write per-call and per-task token/latency records to this JSON Lines file")
+parser.add_argument("--fake-server", action="store_true",
+                    help="Call a local fake HTTP endpoint through the real client instead of the in-process stub")
+parser.add_argument("--throttle-every", type=int, default=0,
+                    help="With --fake-server, answer every Nth request with 429")
+parser.add_argument("--slow-every", type=int, default=0,
+                    help="With --fake-server, delay every Nth request by 2 seconds")
+parser.add_argument("--hedge-percentile", type=float, default=0,
+                    help="With --fake-server, hedge model calls slower than this percentile (0: off)")
+parser.add_argument("--stream", action="store_true",
+                    help="With --fake-server, stream responses and execute actions as they arrive")
+parser.add_argument("--output",
+                    help="Write the JSON report to this file instead of stdout")
+parser.add_argument("--trace", metavar="FILE",
+                    help="Also write the benchmarked spans as Chrome trace_event JSON")
+parser.add_argument("--log-file", default="benchmark_log.jsonl",
+                    help="JSON Lines log file for the benchmarked runs")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    logger = event_log.configure(path=args.log_file, level="WARNING", console=False)
+    if args.trace:
+        tracing.enable()
+    try:
+        report = asyncio.run(run_benchmark(args))
+    finally:
+        logger.close()
+    if args.trace:
+        tracing.export_chrome_trace(args.trace)
+        report["self_time"] = tracing.summary()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
@@ -0,0 +1,69 @@
+# Warm browser daemon
+#
+# Keeps one Chromium running with its DevTools endpoint exposed so that
+# main.py --connect can attach in milliseconds instead of cold-launching a
+# browser for every run. The browser is health-checked periodically and
+# relaunched if it crashes or stops answering.
+#
+#   python browser_daemon.py --port 9222 --headless
+#   python main.py --connect http://localhost:9222
+import asyncio
+import argparse
+import event_log
+from event_log import log_event
+from playwright.async_api import async_playwright
+
+
+async def is_healthy(browser) -> bool:
+    """Check the browser answers a CDP round-trip, not just that the connection is open."""
+    if not browser.is_connected():
+        return False
+    try:
+        session = await browser.new_browser_cdp_session()
+        await session.send("Browser.getVersion")
+        await session.detach()
+        return True
+    except Exception:
+        return False
+
+
+async def serve(port: int, headless: bool, health_interval: float):
+    """Run a warm Chromium forever, relaunching it whenever a health check fails."""
+    async with async_playwright() as playwright:
+        browser = None
+        while True:
+            if browser is None or not await is_healthy(browser):
+                if browser is not None:
+                    log_event("WARNING: Warm browser failed health check, relaunching")
+                    try:
+                        await browser.close()
+                    except Exception:
+                        pass
+                browser = await playwright.chromium.launch(
+                    headless=headless,
+                    args=[f"--remote-debugging-port={port}"]
+                )
+                log_event(f"INFO: Warm browser ready at http://localhost:{port}")
+            await asyncio.sleep(health_interval)
+
+
+# Command line options
+parser = argparse.ArgumentParser(description="Warm browser daemon for the Computer Use Agent")
+parser.add_argument("--port", type=int, default=9222,
+                    help="Remote debugging port clients connect to")
+parser.add_argument("--headless", action="store_true",
+                    help="Run Chromium without a visible window")
+parser.add_argument("--health-interval", type=float, default=5.0,
+                    help="Seconds between browser health checks")
+parser.add_argument("--log-file", default="browser_daemon.jsonl",
+                    help="JSON Lines log file")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    logger = event_log.configure(path=args.log_file)
+    try:
+        asyncio.run(serve(args.port, args.headless, args.health_interval))
+    except KeyboardInterrupt:
+        log_event("INFO: Warm browser daemon stopped")
+    finally:
+        logger.close()
@@ -0,0 +1,155 @@
+# Browser acquisition and context pooling
+#
+# Tasks borrow a clean, pre-created browser context from a pool and hand it
+# back when done instead of creating and tearing one down per task. Between
+# tasks a context gets a fresh page and loses its cookies, permissions and the
+# site storage (localStorage, IndexedDB, caches) of every origin it opened.
+# Contexts are health-checked on return and recycled after a fixed number of
+# uses so long-lived browsers don't grow without bound; a replacement that
+# fails to open is retried by the next acquire(), so the pool never shrinks.
+# The browser itself is either
+# launched locally or, when an endpoint is given, attached to a warm Chromium
+# kept alive by browser_daemon.py.
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from event_log import log_event
+
+
+async def open_browser(playwright, headless: bool = False, endpoint: str = None):
+    """Attach to a warm browser over CDP when an endpoint is given, otherwise launch one."""
+    if endpoint:
+        log_event(f"INFO: Connecting to warm browser at {endpoint}")
+        return await playwright.chromium.connect_over_cdp(endpoint)
+    log_event("INFO: Launching Playwright browser")
+    return await playwright.chromium.launch(headless=headless)
+
+
+class ContextPool:
+    """A fixed-size pool of reusable browser contexts, each with one ready page."""
+
+    def __init__(self, browser, size: int, viewport: dict, max_uses: int = 20, setup=None):
+        self.browser = browser
+        self.size = size
+        self.viewport = viewport
+        self.max_uses = max_uses
+        # Optional coroutine run on every new context, e.g. to install request routes
+        self.setup = setup
+        # Idle contexts; None stands for a slot whose context still has to be created
+        self._idle = asyncio.Queue()
+        self._uses = {}
+        # Context -> origins its pages navigated to, whose storage is cleared on reset
+        self._origins = {}
+
+    async def start(self):
+        """Pre-create every context so the first tasks don't pay for it."""
+        contexts = await asyncio.gather(*(self._create() for _ in range(self.size)))
+        for context in contexts:
+            self._idle.put_nowait(context)
+
+    async def _create(self):
+        context = await self.browser.new_context(viewport=self.viewport)
+        origins = self._origins[context] = set()
+
+        def track_origin(request):
+            if request.is_navigation_request():
+                parsed = urlparse(request.url)
+                if parsed.scheme in ("http", "https"):
+                    origins.add(f"{parsed.scheme}://{parsed.netloc}")
+
+        context.on("request", track_origin)
+        if self.setup is not None:
+            await self.setup(context)
+        await context.new_page()
+        self._uses[context] = 0
+        return context
+
+    async def _discard(self, context):
+        self._uses.pop(context, None)
+        self._origins.pop(context, None)
+        try:
+            await context.close()
+        except Exception as e:
+            log_event(f"WARNING: Could not close browser context: {str(e)}")
+
+    async def _is_healthy(self, context) -> bool:
+        if not self.browser.is_connected():
+            return False
+        try:
+            return not context.pages[0].is_closed()
+        except Exception:
+            return False
+
+    async def _reset(self, context):
+        """Put a returned context back into a clean state: one new blank page, no cookies, no site storage."""
+        page, *extra = context.pages
+        for other in extra:
+            await other.close()
+        await context.clear_cookies()
+        await context.clear_permissions()
+        origins = self._origins.get(context, set())
+        if origins:
+            # localStorage, IndexedDB, Cache Storage, service workers and the rest, per origin visited
+            session = await context.new_cdp_session(page)
+            try:
+                await asyncio.gather(*(session.send("Storage.clearDataForOrigin",
+                                                    {"origin": origin, "storageTypes": "all"})
+                                       for origin in origins))
+            finally:
+                await session.detach()
+            origins.clear()
+        # sessionStorage belongs to the tab, so the next task gets a new one
+        await context.new_page()
+        await page.close()
+
+    async def acquire(self):
+        """Borrow a context, waiting if every context is in use."""
+        context = await self._idle.get()
+        if context is not None:
+            return context
+        # The slot lost its context when a replacement failed to open; try again now
+        try:
+            context = await self._create()
+        except Exception:
+            self._idle.put_nowait(None)
+            raise
+        return context
+
+    async def release(self, context):
+        """Return a context; it is reset for reuse, or replaced if worn out or broken."""
+        self._uses[context] = self._uses.get(context, 0) + 1
+        reusable = self._uses[context] < self.max_uses and await self._is_healthy(context)
+        if reusable:
+            try:
+                await self._reset(context)
+            except Exception as e:
+                log_event(f"WARNING: Could not reset browser context: {str(e)}")
+                reusable = False
+
+        if not reusable:
+            log_event(f"INFO: Recycling browser context after {self._uses[context]} uses")
+            await self._discard(context)
+            try:
+                context = await self._create()
+            except Exception as e:
+                # Keep the slot; the next acquire() creates its context
+                log_event(f"WARNING: Could not create a replacement browser context: {str(e)}")
+                context = None
+        self._idle.put_nowait(context)
+
+    @asynccontextmanager
+    async def context(self):
+        """Borrow a context for the duration of a with block."""
+        context = await self.acquire()
+        try:
+            yield context
+        finally:
+            await self.release(context)
+
+    async def close(self):
+        """Close every idle context."""
+        while not self._idle.empty():
+            context = self._idle.get_nowait()
+            if context is not None:
+                await self._discard(context)
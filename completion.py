@@ -0,0 +1,112 @@
+# Local task-completion detection
+#
+# Decides whether the task's goal state has been reached by looking at the page
+# itself instead of at the model's reply. One page.evaluate call collects the
+# page signals (URL, <article> element, readability-style text density); the
+# goal is a small dict of detector name -> parameter evaluated against those
+# signals. The agent loop checks it after every action batch and stops as soon
+# as the goal is reached, so no model call is spent confirming it.
+import re
+
+SIGNALS_SCRIPT = '''() => {
+    // Readability-style scoring: paragraphs of real prose (long, few links)
+    // credit their parent, and the best parent is the main content block.
+    const scores = new Map();
+    for (const p of document.querySelectorAll('p')) {
+        const text = (p.innerText || '').trim();
+        if (text.length < 80) continue;
+        let linkChars = 0;
+        for (const a of p.querySelectorAll('a')) linkChars += (a.innerText || '').length;
+        if (linkChars / text.length > 0.3) continue;
+        scores.set(p.parentElement, (scores.get(p.parentElement) || 0) + text.length);
+    }
+    const article = document.querySelector('article, [itemtype*="Article"]');
+    const ogType = document.querySelector('meta[property="og:type"]');
+    return {
+        url: location.href,
+        host: location.hostname,
+        path: location.pathname,
+        title: document.title,
+        has_article: !!article || (!!ogType && ogType.content === 'article'),
+        article_chars: article ? (article.innerText || '').length : 0,
+        readable_chars: Math.max(0, ...scores.values()),
+    };
+}'''
+
+# Goal for the default "open a news article from the search results" task:
+# any one of these is enough. No URL patterns: the search engine's own news
+# lists (www.bing.com/news/search, /news/topicview) look like article paths.
+DEFAULT_GOAL = {
+    "match": "any",
+    "article": 500,
+    "readable_chars": 1500,
+    "leave_domain": True,
+}
+
+
+def _base_domain(host: str) -> str:
+    return host[4:] if host.startswith("www.") else host
+
+
+def _url_patterns(signals: dict, patterns, start_host: str) -> bool:
+    # Pages on the search engine itself are result lists, however their paths look
+    if start_host and signals["host"] and _base_domain(signals["host"]) == _base_domain(start_host):
+        return False
+    # Host and path only: the search results URL contains the query, which
+    # would otherwise match words like "news" before anything was opened
+    target = signals["host"] + signals["path"]
+    return any(re.search(pattern, target, re.IGNORECASE) for pattern in patterns)
+
+
+def _article(signals: dict, min_chars, start_host: str) -> bool:
+    return signals["has_article"] and signals["article_chars"] >= min_chars
+
+
+def _readable_chars(signals: dict, min_chars, start_host: str) -> bool:
+    return signals["readable_chars"] >= min_chars
+
+
+def _leave_domain(signals: dict, enabled, start_host: str) -> bool:
+    if not enabled or not start_host or not signals["host"]:
+        return False
+    host, start = _base_domain(signals["host"]), _base_domain(start_host)
+    return not (host == start or host.endswith("." + start) or start.endswith("." + host))
+
+
+# Detector name -> function(signals, parameter, start_host) -> bool
+DETECTORS = {
+    "url_patterns": _url_patterns,
+    "article": _article,
+    "readable_chars": _readable_chars,
+    "leave_domain": _leave_domain,
+}
+
+
+def register_detector(name: str, detector):
+    """Make a custom detector available to goals under this name."""
+    DETECTORS[name] = detector
+
+
+class CompletionDetector:
+    """Checks a task's goal against the current page in a single round trip."""
+
+    def __init__(self, goal: dict = None, start_host: str = None):
+        goal = dict(DEFAULT_GOAL if goal is None else goal)
+        self.match = goal.pop("match", "any")
+        unknown = set(goal) - set(DETECTORS)
+        if unknown:
+            raise ValueError(f"Unknown completion detectors: {', '.join(sorted(unknown))}")
+        self.goal = goal
+        # Host of the search engine; leaving it counts as opening a result
+        self.start_host = start_host
+
+    async def check(self, page):
+        """Return (reached, reasons, signals); reasons names the detectors that matched."""
+        signals = await page.evaluate(SIGNALS_SCRIPT)
+        reasons = [name for name, parameter in self.goal.items()
+                   if DETECTORS[name](signals, parameter, self.start_host)]
+        if self.match == "all":
+            reached = len(reasons) == len(self.goal)
+        else:
+            reached = bool(reasons)
+        return reached, reasons, signals
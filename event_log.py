@@ -0,0 +1,179 @@
+# Buffered, structured event logging
+#
+# log_event() used to open log.txt, append one line and close it on every call.
+# Records are now put on a bounded queue and a background writer thread writes
+# them to a JSON Lines file in batches. Each record carries a timestamp, level,
+# the current task, phase and iteration, and any structured fields. Records
+# below the configured level are dropped before anything is formatted, so
+# DEBUG-grade dumps cost nothing when disabled.
+import atexit
+import contextvars
+import datetime
+import json
+import os
+import queue
+import threading
+import time
+
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+
+_STOP = object()
+
+# Task id, phase and iteration; a context variable so concurrent asyncio tasks each keep their own
+_context = contextvars.ContextVar("event_log_context", default={})
+
+
+class EventLogger:
+    """Writes structured log records to a JSON Lines file from a background thread."""
+
+    def __init__(self, path: str = "log.jsonl", level: str = "INFO", flush_interval: float = 1.0,
+                 max_bytes: int = 10 * 1024 * 1024, backup_count: int = 3,
+                 queue_size: int = 10000, console: bool = True):
+        self.path = path
+        self.level = LEVELS[level.upper()]
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.console = console
+        self.dropped = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="event-log-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def enabled(self, level: str) -> bool:
+        """Whether records at this level would be written."""
+        return LEVELS[level] >= self.level
+
+    def set_context(self, **values):
+        """Set the task_id, phase or iteration attached to following records in this context.
+
+        Entering a new phase clears the iteration unless one is given.
+        """
+        context = dict(_context.get())
+        if "phase" in values:
+            context["iteration"] = None
+        context.update(values)
+        _context.set(context)
+
+    def log(self, level: str, message: str, **fields):
+        """Queue a record; never blocks the caller. Records are dropped if the queue is full."""
+        if LEVELS[level] < self.level:
+            return
+        context = _context.get()
+        record = {
+            "ts": datetime.datetime.now().isoformat(),
+            "level": level,
+            "task_id": context.get("task_id"),
+            "phase": context.get("phase"),
+            "iteration": context.get("iteration"),
+            "message": message,
+        }
+        if fields:
+            record["fields"] = fields
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def debug(self, message: str, **fields):
+        self.log("DEBUG", message, **fields)
+
+    def info(self, message: str, **fields):
+        self.log("INFO", message, **fields)
+
+    def warning(self, message: str, **fields):
+        self.log("WARNING", message, **fields)
+
+    def error(self, message: str, **fields):
+        self.log("ERROR", message, **fields)
+
+    def close(self):
+        """Flush pending records and stop the writer thread."""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        batch = []
+        last_flush = time.monotonic()
+        running = True
+        while running:
+            try:
+                record = self._queue.get(timeout=self.flush_interval)
+                if record is _STOP:
+                    running = False
+                else:
+                    batch.append(record)
+            except queue.Empty:
+                pass
+
+            if batch and (not running or time.monotonic() - last_flush >= self.flush_interval):
+                self._write(batch)
+                batch = []
+                last_flush = time.monotonic()
+
+    def _write(self, batch: list):
+        # Records are serialized here, off the caller's thread
+        lines = [json.dumps(record, default=str) for record in batch]
+        if self.dropped:
+            lines.append(json.dumps({
+                "ts": datetime.datetime.now().isoformat(),
+                "level": "WARNING",
+                "message": f"Dropped {self.dropped} log records because the queue was full",
+            }))
+            self.dropped = 0
+        try:
+            self._rotate_if_needed()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+        except OSError as e:
+            print(f"LOG: WARNING: Could not write log file: {str(e)}")
+        if self.console:
+            for record in batch:
+                print(f"LOG: {record['level']}: {record['message']}")
+
+    def _rotate_if_needed(self):
+        try:
+            if os.path.getsize(self.path) < self.max_bytes:
+                return
+        except OSError:
+            return
+        # log.jsonl -> log.jsonl.1 -> log.jsonl.2 ... oldest is discarded
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+
+_logger = None
+
+
+def configure(**kwargs) -> EventLogger:
+    """Create the process-wide logger, replacing any existing one."""
+    global _logger
+    if _logger is not None:
+        _logger.close()
+    _logger = EventLogger(**kwargs)
+    return _logger
+
+
+def get_logger() -> EventLogger:
+    """Return the process-wide logger, creating one with defaults if needed."""
+    global _logger
+    if _logger is None:
+        _logger = EventLogger()
+    return _logger
+
+
+def log_event(event: str, **fields):
+    """Log an event string such as "INFO: message"; the prefix selects the level."""
+    level, sep, message = event.partition(": ")
+    if not sep or level not in LEVELS:
+        level, message = "INFO", event
+    get_logger().log(level, message, **fields)
@@ -0,0 +1,97 @@
+# Stub computer-use model for benchmarks
+#
+# Stands in for AsyncAzureOpenAI with the same client.responses.create shape
+# and returns canned computer_call outputs: the search step presses Enter, the
+# results step clicks the first search result, and a computer_call_output is
+# answered with a plain message so the step ends. An optional artificial
+# latency simulates the model's think time. The same canned responses are
+# served over HTTP by fake_model_server.py.
+import asyncio
+import itertools
+import time
+from types import SimpleNamespace
+
+from responses_namespace import ResponsesNamespace
+
+# Where the first result link sits on the fixture results page at 1024x768
+FIRST_RESULT_POSITION = (60, 75)
+VIEWPORT_WIDTH, VIEWPORT_HEIGHT = 1024, 768
+
+
+def _computer_call(action: dict, summary: str, new_id) -> list:
+    return [
+        {"type": "reasoning", "id": new_id("rs"), "summary": [{"type": "summary_text", "text": summary}]},
+        {"type": "computer_call", "id": new_id("cu"), "call_id": new_id("call"), "action": action,
+         "pending_safety_checks": [], "status": "completed"},
+    ]
+
+
+def canned_output(request: dict, new_id) -> list:
+    """Output items, as JSON-style dicts, for a responses.create request."""
+    items = request.get("input", [])
+    if any(isinstance(item, dict) and item.get("type") == "computer_call_output" for item in items):
+        # The action ran and its screenshot came back, so this step is done
+        return [{"type": "message", "id": new_id("msg"), "role": "assistant", "status": "completed",
+                 "content": [{"type": "output_text", "text": "Done with this step.", "annotations": []}]}]
+    if "search box" in str(items):
+        return _computer_call({"type": "keypress", "keys": ["ENTER"]}, "Pressing Enter to run the search.", new_id)
+    # Positions are in page pixels; the model sees the display size declared in the tool
+    tool = request["tools"][0]
+    x, y = FIRST_RESULT_POSITION
+    x = round(x * tool["display_width"] / VIEWPORT_WIDTH)
+    y = round(y * tool["display_height"] / VIEWPORT_HEIGHT)
+    return _computer_call({"type": "click", "button": "left", "x": x, "y": y},
+                          "Clicked on the first news article in the results.", new_id)
+
+
+def canned_response(request: dict, new_id) -> dict:
+    """A complete Response object, as a JSON-style dict, for a responses.create request."""
+    return {
+        "id": new_id("resp"),
+        "object": "response",
+        "created_at": int(time.time()),
+        "status": "completed",
+        "model": request.get("model", "computer-use-preview"),
+        "output": canned_output(request, new_id),
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": request.get("tools", []),
+        "previous_response_id": request.get("previous_response_id"),
+        "usage": {
+            "input_tokens": 1000,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": 50,
+            "output_tokens_details": {"reasoning_tokens": 20},
+            "total_tokens": 1050,
+        },
+    }
+
+
+def _namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+class FakeModelClient:
+    """Async client stub that returns canned computer_call responses."""
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = 0
+        self._ids = itertools.count(1)
+        self.responses = ResponsesNamespace(self)
+
+    def _item_id(self, prefix: str) -> str:
+        return f"{prefix}_fake_{next(self._ids)}"
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return _namespace(canned_response(kwargs, self._item_id))
+
+    async def close(self):
+        pass
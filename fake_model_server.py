@@ -0,0 +1,172 @@
+# Local fake model endpoint for resilience testing
+#
+# An HTTP server that answers POST .../responses like the Responses API, with
+# the canned outputs from fake_model.py, so the real openai client and the
+# resilient wrapper in model_client.py can be exercised without network access.
+# It can throttle (429 with Retry-After), fail (503) or respond slowly on a
+# fixed schedule, and streams server-sent events when the request asks for
+# stream=true. It runs in a background thread, like fixture_site.py.
+#
+#   python fake_model_server.py --port 8765 --throttle-every 5 --slow-every 10
+import argparse
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fake_model import canned_response
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        server = self.server.owner
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.split("?", 1)[0].endswith("/responses"):
+            self._send_json(404, {"error": {"message": "Not found", "type": "invalid_request_error"}})
+            return
+
+        number = server.next_request()
+        if server.throttle_every and number % server.throttle_every == 0:
+            server.throttled += 1
+            self._send_json(429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+                            {"Retry-After": f"{server.retry_after:g}"})
+            return
+        if server.error_every and number % server.error_every == 0:
+            self._send_json(503, {"error": {"message": "Service unavailable", "type": "server_error"}})
+            return
+        delay = server.latency
+        if server.slow_every and number % server.slow_every == 0:
+            delay += server.slow_delay
+        if delay:
+            time.sleep(delay)
+
+        request = json.loads(body)
+        response = canned_response(request, server.new_id)
+        if request.get("stream"):
+            self._stream(response, server.item_delay)
+        else:
+            self._send_json(200, response)
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, response: dict, item_delay: float):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        sequence = itertools.count()
+        in_progress = dict(response, status="in_progress", output=[], usage=None)
+        self._event("response.created", {"response": in_progress, "sequence_number": next(sequence)})
+        for index, item in enumerate(response["output"]):
+            self._event("response.output_item.added",
+                        {"output_index": index, "item": dict(item, status="in_progress"), "sequence_number": next(sequence)})
+            if item_delay:
+                time.sleep(item_delay)
+            self._event("response.output_item.done",
+                        {"output_index": index, "item": item, "sequence_number": next(sequence)})
+        self._event("response.completed", {"response": response, "sequence_number": next(sequence)})
+
+    def _event(self, event_type: str, payload: dict):
+        payload = dict(payload, type=event_type)
+        self.wfile.write(f"event: {event_type}\ndata: {json.dumps(payload)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+
+class FakeModelServer:
+    """Serves canned Responses API replies on localhost, with scheduled throttling and slowness."""
+
+    def __init__(self, port: int = 0, latency: float = 0.0, throttle_every: int = 0, retry_after: float = 1.0,
+                 error_every: int = 0, slow_every: int = 0, slow_delay: float = 2.0, item_delay: float = 0.0):
+        self.latency = latency
+        # Every Nth request gets a 429 / 503 / an extra slow_delay seconds; 0 disables
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.error_every = error_every
+        self.slow_every = slow_every
+        self.slow_delay = slow_delay
+        # Pause between streamed output items
+        self.item_delay = item_delay
+        self.requests = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.owner = self
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-model-server", daemon=True)
+
+    def next_request(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+    def new_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}_fake_{next(self._ids)}"
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# Command line options
+parser = argparse.ArgumentParser(description="Fake Responses API endpoint with simulated throttling")
+parser.add_argument("--port", type=int, default=8765,
+                    help="Port to listen on")
+parser.add_argument("--latency", type=float, default=0.0,
+                    help="Seconds every request takes")
+parser.add_argument("--throttle-every", type=int, default=0,
+                    help="Answer every Nth request with 429 Too Many Requests")
+parser.add_argument("--retry-after", type=float, default=1.0,
+                    help="Retry-After seconds sent with a 429")
+parser.add_argument("--error-every", type=int, default=0,
+                    help="Answer every Nth request with 503 Service Unavailable")
+parser.add_argument("--slow-every", type=int, default=0,
+                    help="Delay every Nth request by --slow-delay seconds")
+parser.add_argument("--slow-delay", type=float, default=2.0,
+                    help="Extra seconds for a slow request")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+    server = FakeModelServer(args.port, latency=args.latency, throttle_every=args.throttle_every,
+                             retry_after=args.retry_after, error_every=args.error_every,
+                             slow_every=args.slow_every, slow_delay=args.slow_delay)
+    print(f"Fake model endpoint at {server.url} (use it as AZURE_OPENAI_ENDPOINT)")
+    server.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
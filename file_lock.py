@@ -0,0 +1,40 @@
+# Cross-process file lock
+#
+# Batch workers share the asset cache index and the selector memory file, and
+# each one rewrites it when it finishes. The lock is a sidecar file created
+# with O_EXCL, which works the same on every platform and filesystem; a lock
+# left behind by a crashed process is broken once it is older than stale_after.
+import os
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def file_lock(path: str, timeout: float = 10.0, stale_after: float = 60.0, poll_interval: float = 0.05):
+    """Hold path + ".lock" for the duration of the block; TimeoutError if it stays taken."""
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                # Released (or broken by someone else) in the meantime
+                continue
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}")
+            time.sleep(poll_interval)
+    try:
+        os.write(fd, str(os.getpid()).encode())
+        os.close(fd)
+        yield
+    finally:
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
@@ -0,0 +1,129 @@
+# Local fixture site for benchmarks
+#
+# A tiny HTTP server that mimics the parts of Bing the agent relies on: a home
+# page whose search form uses the same #sb_form_q / #search_icon / form
+# structure targeted by SEARCH_BOX_SELECTORS and SEARCH_BUTTON_SELECTORS, a
+# /search results page with news links at fixed positions, and /news/<slug> article pages. It runs
+# in a background thread and needs no network access.
+import html
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+HOME_PAGE = '''<!DOCTYPE html>
+<html>
+<head><title>Bing</title></head>
+<body>
+    <div id="sbox">
+        <form id="sb_form" action="/search" method="get">
+            <input id="sb_form_q" class="b_searchbox" name="q" type="search"
+                   aria-label="Enter your search here - Search suggestions will show as you type"
+                   style="width: 500px; height: 40px;">
+            <label id="search_icon" for="sb_form_go" aria-label="Search the web" style="cursor: pointer;">
+                <svg width="20" height="20" aria-label="Search the web"><circle cx="8" cy="8" r="6" stroke="black" fill="none"/></svg>
+            </label>
+            <input id="sb_form_go" type="submit" value="Search" style="display: none;">
+        </form>
+    </div>
+</body>
+</html>'''
+
+RESULTS_PAGE = '''<!DOCTYPE html>
+<html>
+<head>
+<title>{query} - Search</title>
+<style>
+    body {{ margin: 0; font: 16px sans-serif; }}
+    #sb_form {{ height: 60px; margin: 0; padding: 10px 20px; box-sizing: border-box; }}
+    #b_results {{ list-style: none; margin: 0; padding: 0 20px; }}
+    .b_algo {{ height: 80px; margin: 0; }}
+    .b_algo h2 {{ margin: 0; font-size: 20px; line-height: 30px; }}
+</style>
+</head>
+<body>
+    <form id="sb_form" action="/search" method="get">
+        <input id="sb_form_q" class="b_searchbox" name="q" type="search" value="{query}" aria-label="Search">
+        <label id="search_icon" for="sb_form_go" aria-label="Search the web">Search</label>
+        <input id="sb_form_go" type="submit" value="Search" style="display: none;">
+    </form>
+    <ol id="b_results">
+        {results}
+    </ol>
+</body>
+</html>'''
+
+RESULT_ITEM = '''<li class="b_algo"><h2><a href="/news/{slug}">{title}</a></h2><p>{snippet}</p></li>'''
+
+ARTICLE_PAGE = '''<!DOCTYPE html>
+<html>
+<head><title>{title}</title></head>
+<body>
+    <article>
+        <h1>{title}</h1>
+        {paragraphs}
+    </article>
+</body>
+</html>'''
+
+ARTICLE_COUNT = 5
+
+
+class _Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/":
+            self._send(HOME_PAGE)
+        elif url.path == "/search":
+            query = html.escape(parse_qs(url.query).get("q", [""])[0])
+            results = "\n        ".join(
+                RESULT_ITEM.format(slug=f"article-{i}", title=f"{query}: story {i}",
+                                   snippet=f"The latest on {query}, part {i}.")
+                for i in range(1, ARTICLE_COUNT + 1)
+            )
+            self._send(RESULTS_PAGE.format(query=query, results=results))
+        elif url.path.startswith("/news/"):
+            slug = html.escape(url.path[len("/news/"):])
+            paragraphs = "\n        ".join(f"<p>Paragraph {i} of {slug}. " + "Lorem ipsum dolor sit amet. " * 20 + "</p>"
+                                           for i in range(1, 6))
+            self._send(ARTICLE_PAGE.format(title=f"News article {slug}", paragraphs=paragraphs))
+        else:
+            self.send_error(404)
+
+    def _send(self, body: str):
+        data = body.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # Keep benchmark output clean
+        pass
+
+
+class FixtureSite:
+    """Serves the fixture site on localhost from a background thread."""
+
+    def __init__(self, port: int = 0):
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fixture-site", daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
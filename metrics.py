@@ -0,0 +1,156 @@
+# Token, cost and latency accounting with a budget governor
+#
+# Every model call is recorded from response.usage (input, cached, output and
+# reasoning tokens) together with its wall time and an estimate of the image
+# tokens in the request, priced from a per-model table. Calls add up per task.
+# The governor compares a task's running totals against its token, dollar and
+# wall-clock budgets: past a soft threshold the agent downgrades to cheaper
+# requests, past the budget it stops. Per-call and per-task records go to a
+# JSON Lines metrics file for capacity planning.
+import json
+import math
+import os
+import threading
+import time
+
+from event_log import log_event
+
+# USD per million tokens
+DEFAULT_PRICING = {
+    "computer-use-preview": {"input": 3.00, "cached_input": 3.00, "output": 12.00},
+}
+
+
+def load_pricing(path: str = None) -> dict:
+    """The default pricing table, with models from a JSON file of the same shape added or overridden."""
+    pricing = {model: dict(rates) for model, rates in DEFAULT_PRICING.items()}
+    if path:
+        with open(path, encoding="utf-8") as f:
+            for model, rates in json.load(f).items():
+                pricing.setdefault(model, {}).update(rates)
+    return pricing
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Tokens for one high-detail image: 85 plus 170 per 512px tile after the standard resize."""
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def _detail(usage, details: str, field: str) -> int:
+    value = getattr(getattr(usage, details, None), field, None)
+    return value or 0
+
+
+class TaskUsage:
+    """Running token, cost and latency totals for one task, one record per model call."""
+
+    def __init__(self, task_id: str, model: str, pricing: dict, fallback_cost: float = 0.0):
+        self.task_id = task_id
+        self.model = model
+        self.rates = pricing.get(model)
+        if self.rates is None:
+            log_event(f"WARNING: No pricing for model {model}, using the estimated cost per call")
+        # Used for calls whose response carries no usage, or models without pricing
+        self.fallback_cost = fallback_cost
+        self.started = time.monotonic()
+        self.calls = []
+
+    def record(self, response, latency: float, iteration: int, image_tokens: int = 0) -> dict:
+        usage = getattr(response, "usage", None)
+        call = {
+            "type": "call",
+            "task_id": self.task_id,
+            "iteration": iteration,
+            "model": self.model,
+            "input_tokens": getattr(usage, "input_tokens", 0) or 0,
+            "cached_tokens": _detail(usage, "input_tokens_details", "cached_tokens"),
+            "output_tokens": getattr(usage, "output_tokens", 0) or 0,
+            "reasoning_tokens": _detail(usage, "output_tokens_details", "reasoning_tokens"),
+            # The API doesn't report image tokens separately; they are part of input_tokens
+            "image_tokens_est": image_tokens,
+            "latency_s": round(latency, 3),
+            # Served by the record/replay cache: nothing was billed
+            "replayed": bool(getattr(response, "from_cache", False)),
+        }
+        if call["replayed"]:
+            call["cost_usd"] = 0.0
+        else:
+            call["cost_usd"] = self._price(call) if usage is not None else self.fallback_cost
+        self.calls.append(call)
+        return call
+
+    def _price(self, call: dict) -> float:
+        if self.rates is None:
+            return self.fallback_cost
+        uncached = call["input_tokens"] - call["cached_tokens"]
+        return (uncached * self.rates["input"]
+                + call["cached_tokens"] * self.rates.get("cached_input", self.rates["input"])
+                + call["output_tokens"] * self.rates["output"]) / 1_000_000
+
+    @property
+    def tokens(self) -> int:
+        """Billed tokens; replayed calls don't count against a budget."""
+        return sum(call["input_tokens"] + call["output_tokens"] for call in self.calls if not call["replayed"])
+
+    @property
+    def cost(self) -> float:
+        return sum(call["cost_usd"] for call in self.calls)
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def totals(self) -> dict:
+        fields = ("input_tokens", "cached_tokens", "output_tokens", "reasoning_tokens", "image_tokens_est")
+        totals = {field: sum(call[field] for call in self.calls) for field in fields}
+        totals["calls"] = len(self.calls)
+        totals["replayed_calls"] = sum(1 for call in self.calls if call["replayed"])
+        totals["model_latency_s"] = round(sum(call["latency_s"] for call in self.calls), 3)
+        totals["cost_usd"] = self.cost
+        return totals
+
+
+class Budget:
+    """Per-task limits; 0 means unlimited. Past downgrade_at of any limit the agent goes cheaper."""
+
+    def __init__(self, max_tokens: int = 0, max_cost: float = 0.0, max_seconds: float = 0.0,
+                 downgrade_at: float = 0.75):
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.max_seconds = max_seconds
+        self.downgrade_at = downgrade_at
+
+    def check(self, usage: TaskUsage) -> tuple:
+        """Return ("ok" | "downgrade" | "abort", reason)."""
+        spent = [
+            ("tokens", usage.tokens, self.max_tokens),
+            ("cost", usage.cost, self.max_cost),
+            ("wall time", usage.elapsed, self.max_seconds),
+        ]
+        for name, value, limit in spent:
+            if limit and value >= limit:
+                return "abort", f"{name} budget exceeded ({value:.4g} >= {limit:.4g})"
+        for name, value, limit in spent:
+            if limit and value >= limit * self.downgrade_at:
+                return "downgrade", f"{name} at {value / limit:.0%} of budget"
+        return "ok", None
+
+
+class MetricsWriter:
+    """Appends per-call and per-task records to a JSON Lines file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def write(self, records: list):
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
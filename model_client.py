@@ -0,0 +1,173 @@
+# Resilient model client
+#
+# Wraps the async OpenAI client with the same client.responses.create shape.
+# All tasks share one client and so one tuned HTTP connection pool. Throttling
+# (429) and server errors (5xx) are retried with jittered exponential backoff
+# that never waits less than the server's Retry-After. Optionally a second,
+# identical request is hedged once the first has been slower than a chosen
+# percentile of recent calls, and whichever answers first wins. In streaming
+# mode the output items are handed to a callback as soon as each one is done,
+# so the agent can start executing the first computer_call before the rest of
+# the response has arrived.
+import asyncio
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+
+import openai
+
+from event_log import log_event
+from responses_namespace import ResponsesNamespace
+from tracing import span
+
+# Status codes worth retrying besides 429 and 5xx
+RETRYABLE_STATUS = {408, 409}
+
+
+def make_http_client(max_connections: int = 50, max_keepalive: int = 20, keepalive_expiry: float = 60.0,
+                     timeout: float = 120.0, connect_timeout: float = 10.0):
+    """HTTP client for the SDK with a connection pool sized for concurrent tasks."""
+    # The SDK's own limits/timeout types, so this works whichever HTTP library it is built on
+    limits_type = type(openai.DEFAULT_CONNECTION_LIMITS)
+    return openai.DefaultAsyncHttpxClient(
+        limits=limits_type(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                           keepalive_expiry=keepalive_expiry),
+        timeout=openai.Timeout(timeout, connect=connect_timeout),
+    )
+
+
+def retry_after(error) -> float:
+    """Seconds the server asked us to wait, from Retry-After / retry-after-ms, or None."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    headers = response.headers
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            # HTTP date form
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def is_retryable(error) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500 or error.status_code in RETRYABLE_STATUS
+    return False
+
+
+class ResilientClient:
+    """Retrying, optionally hedging and streaming wrapper around an async OpenAI client."""
+
+    def __init__(self, client, max_retries: int = 4, base_delay: float = 0.5, max_delay: float = 30.0,
+                 hedge_percentile: float = 0, hedge_min_samples: int = 20, stream: bool = False):
+        self._client = client
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # 0 disables hedging; e.g. 95 hedges calls slower than the recent p95
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.stream = stream
+        self.retries = 0
+        self.hedged = 0
+        self._latencies = deque(maxlen=200)
+        self.responses = ResponsesNamespace(self)
+
+    def _backoff(self, attempt: int, error) -> float:
+        # Full jitter, but never sooner than the server asked for
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        requested = retry_after(error)
+        if requested is not None:
+            delay = max(delay, min(requested, self.max_delay))
+        return delay
+
+    def _hedge_threshold(self):
+        if not self.hedge_percentile or len(self._latencies) < self.hedge_min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_percentile / 100))]
+
+    async def create(self, on_output_item=None, **kwargs):
+        """responses.create with retries; on_output_item(item) is awaited per finished item when streaming."""
+        streamed = []
+        attempt = 0
+        while True:
+            try:
+                if self.stream:
+                    return await self._stream(kwargs, on_output_item, streamed)
+                return await self._hedged(kwargs)
+            except Exception as e:
+                # A stream that already produced items can't be replayed without repeating their actions
+                if attempt >= self.max_retries or streamed or not is_retryable(e):
+                    raise
+                delay = self._backoff(attempt, e)
+                attempt += 1
+                self.retries += 1
+                log_event(f"WARNING: Model call failed ({type(e).__name__}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+                with span("model_backoff", attempt=attempt):
+                    await asyncio.sleep(delay)
+
+    async def _attempt(self, kwargs):
+        started = time.monotonic()
+        response = await self._client.responses.create(**kwargs)
+        self._latencies.append(time.monotonic() - started)
+        return response
+
+    async def _hedged(self, kwargs):
+        threshold = self._hedge_threshold()
+        if threshold is None:
+            return await self._attempt(kwargs)
+
+        primary = asyncio.ensure_future(self._attempt(kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=threshold)
+        if done:
+            return primary.result()
+
+        # The first request is in the slow tail; race an identical one against it
+        self.hedged += 1
+        log_event(f"INFO: Model call slower than p{self.hedge_percentile:g} ({threshold:.1f}s), sending a hedged request")
+        backup = asyncio.ensure_future(self._attempt(kwargs))
+        pending = {primary, backup}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+            # Both failed; surface the primary's error
+            return primary.result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    async def _stream(self, kwargs, on_output_item, streamed: list):
+        started = time.monotonic()
+        stream = await self._client.responses.create(stream=True, **kwargs)
+        response = None
+        async for event in stream:
+            if event.type == "response.output_item.done":
+                streamed.append(event.item)
+                if on_output_item is not None:
+                    await on_output_item(event.item)
+            elif event.type == "response.completed":
+                response = event.response
+            elif event.type in ("response.failed", "response.incomplete", "error"):
+                raise RuntimeError(f"Model stream ended with {event.type}")
+        if response is None:
+            raise RuntimeError("Model stream ended without a completed response")
+        self._latencies.append(time.monotonic() - started)
+        return response
+
+    async def close(self):
+        await self._client.close()
@@ -0,0 +1,165 @@
+# Model-input screenshot optimizer
+#
+# Prepares each screenshot before it is sent to the model. The frame is
+# downscaled to the display size declared in the computer_use_preview tool, and
+# the coordinates in the model's actions are scaled back up to page space.
+# Optionally only the region that changed since the previous frame is kept
+# (everything else is filled with flat grey, which compresses to almost
+# nothing). Finally the frame is encoded as PNG, JPEG and WebP at a few
+# qualities, and the smallest encoding whose PSNR against the frame stays above
+# a threshold is sent. Needs Pillow; without it screenshots go to the model
+# unchanged at viewport size. A frame can be encoded ahead of time (while the
+# model is still thinking) and only committed once it is actually sent.
+import asyncio
+import io
+import math
+
+from event_log import log_event
+from tracing import span
+
+try:
+    from PIL import Image, ImageChops, ImageStat
+except ImportError:
+    Image = None
+
+# Flat fill for the unchanged part of a delta frame
+UNCHANGED_FILL = (128, 128, 128)
+
+MIME_TYPES = {"PNG": "image/png", "JPEG": "image/jpeg", "WEBP": "image/webp"}
+
+
+def psnr(reference, candidate) -> float:
+    """Peak signal-to-noise ratio in dB between two images of the same size and mode."""
+    stat = ImageStat.Stat(ImageChops.difference(reference, candidate))
+    mse = sum(rms ** 2 for rms in stat.rms) / len(stat.rms)
+    if mse == 0:
+        return math.inf
+    return 10 * math.log10(255 ** 2 / mse)
+
+
+class ModelInputOptimizer:
+    """Per-task screenshot preprocessing for the model, plus the matching coordinate mapping."""
+
+    def __init__(self, viewport: dict, display: dict = None, crop_changes: bool = False,
+                 min_psnr: float = 35.0, lossy_qualities=(85, 70, 55), max_changed_fraction: float = 0.6):
+        if Image is None and (display not in (None, viewport) or crop_changes):
+            log_event("WARNING: Pillow is not installed, sending screenshots to the model unchanged")
+            display, crop_changes = None, False
+        self.viewport = viewport
+        self.display = display or viewport
+        self.crop_changes = crop_changes
+        self.min_psnr = min_psnr
+        self.lossy_qualities = lossy_qualities
+        # A delta frame is only worth it when most of the page stayed the same
+        self.max_changed_fraction = max_changed_fraction
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self._previous = None
+        # Bumped whenever the state a frame is encoded against changes
+        self._generation = 0
+
+    @property
+    def scale(self) -> tuple:
+        """Factors that turn model (display) coordinates into page coordinates."""
+        return (self.viewport["width"] / self.display["width"],
+                self.viewport["height"] / self.display["height"])
+
+    def downgrade(self, factor: float = 0.75) -> bool:
+        """Switch to smaller screenshots to save tokens; False if they can't be resized."""
+        if Image is None:
+            return False
+        self.display = {"width": round(self.display["width"] * factor),
+                        "height": round(self.display["height"] * factor)}
+        self.reset()
+        return True
+
+    def reset(self):
+        """Forget the previous frame, e.g. after navigating to a new page, so the next frame is sent whole."""
+        self._previous = None
+        self._generation += 1
+
+    async def prepare(self, screenshot: bytes, mime_type: str = "image/png") -> tuple:
+        """Return (bytes, mime_type) of the screenshot as it should be sent to the model."""
+        while True:
+            prepared = self.accept(await self.encode(screenshot, mime_type))
+            if prepared is not None:
+                return prepared
+
+    async def encode(self, screenshot: bytes, mime_type: str = "image/png") -> dict:
+        """Encode a frame against the current state without committing it; see accept()."""
+        encoded = {"screenshot": screenshot, "data": screenshot, "mime_type": mime_type, "image": None,
+                   "generation": self._generation}
+        if Image is None:
+            return encoded
+        with span("model_input"):
+            # Decoding and re-encoding is CPU-bound, so keep it off the event loop
+            loop = asyncio.get_running_loop()
+            encoded["data"], encoded["mime_type"], encoded["image"] = await loop.run_in_executor(
+                None, self._prepare, screenshot, mime_type, dict(self.display), self._previous)
+        return encoded
+
+    def accept(self, encoded: dict):
+        """Commit an encoded frame as sent and return its (bytes, mime_type).
+
+        None if the state changed since it was encoded (a reset, downgrade or another frame), so it is stale.
+        """
+        if encoded["generation"] != self._generation:
+            return None
+        self._generation += 1
+        if encoded["image"] is not None:
+            self._previous = encoded["image"]
+        self.bytes_in += len(encoded["screenshot"])
+        self.bytes_out += len(encoded["data"])
+        return encoded["data"], encoded["mime_type"]
+
+    def _prepare(self, screenshot: bytes, mime_type: str, display: dict, previous) -> tuple:
+        image = Image.open(io.BytesIO(screenshot)).convert("RGB")
+        size = (display["width"], display["height"])
+        untouched = image.size == size
+        if not untouched:
+            image = image.resize(size, Image.LANCZOS)
+
+        frame = image
+        if self.crop_changes and previous is not None:
+            frame = self._delta_frame(image, previous)
+            untouched = untouched and frame is image
+
+        # The browser's own encoding is a candidate too when the frame wasn't changed
+        candidates = [(screenshot, mime_type)] if untouched else []
+        candidates.append((self._encode(frame, "PNG"), MIME_TYPES["PNG"]))
+        for image_format in ("JPEG", "WEBP"):
+            # Quality only drops from here, so stop at the first encoding below the threshold
+            for quality in self.lossy_qualities:
+                data = self._encode(frame, image_format, quality)
+                if data is None:
+                    break
+                if psnr(frame, Image.open(io.BytesIO(data)).convert("RGB")) < self.min_psnr:
+                    break
+                candidates.append((data, MIME_TYPES[image_format]))
+        data, mime_type = min(candidates, key=lambda candidate: len(candidate[0]))
+        return data, mime_type, image
+
+    def _delta_frame(self, image, previous):
+        """Keep only the changed region of the frame, or the whole frame if most of it changed."""
+        box = ImageChops.difference(image, previous).getbbox()
+        if box is None:
+            return image
+        left, top, right, bottom = box
+        if (right - left) * (bottom - top) > self.max_changed_fraction * image.width * image.height:
+            return image
+        frame = Image.new("RGB", image.size, UNCHANGED_FILL)
+        frame.paste(image.crop(box), (left, top))
+        return frame
+
+    @staticmethod
+    def _encode(image, image_format: str, quality: int = None):
+        output = io.BytesIO()
+        options = {"optimize": True}
+        if quality is not None:
+            options["quality"] = quality
+        try:
+            image.save(output, format=image_format, **options)
+        except (KeyError, OSError):
+            # Pillow built without this encoder
+            return None
+        return output.getvalue()
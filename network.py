@@ -0,0 +1,290 @@
+# Network layer: request blocking and a persistent asset cache
+#
+# Every request a browser context makes goes through one route handler. Requests
+# for blocked resource types (images, fonts, media) or ad/analytics domains are
+# aborted before they leave the browser. Static assets (scripts, stylesheets,
+# images, fonts) are served from a content-addressed cache on disk that
+# persists across runs, so repeat visits don't download them again. An entry is
+# served for as long as its response headers say it stays fresh (Cache-Control
+# max-age, Expires, or a fraction of its age since Last-Modified), at most
+# max_age. The cache is size-bounded and evicts least recently used entries.
+# Every task's route handler runs on the one event loop, so blob reads and
+# writes happen on worker threads.
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+from event_log import log_event
+from file_lock import file_lock
+
+DEFAULT_BLOCKED_RESOURCE_TYPES = ["image", "font", "media"]
+
+# Ad, analytics and telemetry hosts; a request is blocked if its host is or ends with one of these
+DEFAULT_BLOCKED_DOMAINS = [
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "adnxs.com",
+    "adsrvr.org",
+    "scorecardresearch.com",
+    "bat.bing.com",
+    "clarity.ms",
+    "c.bing.com",
+    "c.msn.com",
+    "browser.events.data.microsoft.com",
+    "facebook.net",
+    "hotjar.com",
+    "taboola.com",
+    "outbrain.com",
+]
+
+CACHEABLE_RESOURCE_TYPES = {"script", "stylesheet", "image", "font"}
+
+# The cached body is stored decoded, so these no longer describe it
+_DROPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+
+# Share of the time since Last-Modified a response without explicit freshness stays fresh (RFC 9111 4.2.2)
+HEURISTIC_FRESHNESS = 0.1
+
+
+def _http_date(value: str) -> float:
+    return parsedate_to_datetime(value).timestamp()
+
+
+def freshness_lifetime(headers: dict, default: float) -> float:
+    """Seconds a response stays fresh from now, per its caching headers; 0 if it must not be reused as is.
+
+    Without max-age, Expires or Last-Modified the default applies.
+    """
+    headers = {key.lower(): value for key, value in headers.items()}
+    directives = {}
+    for part in headers.get("cache-control", "").lower().split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name] = value.strip('"')
+    # We never revalidate, so no-cache means not reusable at all
+    if "no-cache" in directives or "no-store" in directives:
+        return 0.0
+    try:
+        age = float(headers.get("age") or 0)
+        if "max-age" in directives:
+            lifetime = float(directives["max-age"])
+        elif "expires" in headers:
+            date = _http_date(headers["date"]) if "date" in headers else time.time()
+            lifetime = _http_date(headers["expires"]) - date
+        elif "last-modified" in headers:
+            date = _http_date(headers["date"]) if "date" in headers else time.time()
+            lifetime = (date - _http_date(headers["last-modified"])) * HEURISTIC_FRESHNESS
+        else:
+            lifetime = default
+    except (TypeError, ValueError, IndexError):
+        # An unparseable Expires or max-age counts as already expired
+        return 0.0
+    return max(0.0, lifetime - age)
+
+
+async def _in_thread(function, *args):
+    # Imported here so loading the defaults (options, --check) doesn't pull in asyncio
+    import asyncio
+    return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class NetworkPolicy:
+    """Which requests to abort: by resource type and by host."""
+
+    def __init__(self, blocked_resource_types=DEFAULT_BLOCKED_RESOURCE_TYPES,
+                 blocked_domains=DEFAULT_BLOCKED_DOMAINS):
+        self.blocked_resource_types = set(blocked_resource_types)
+        self.blocked_domains = tuple(blocked_domains)
+        self.blocked = 0
+
+    def should_block(self, request) -> bool:
+        if request.resource_type in self.blocked_resource_types:
+            return True
+        host = urlparse(request.url).hostname or ""
+        return any(host == domain or host.endswith("." + domain) for domain in self.blocked_domains)
+
+
+class AssetCache:
+    """Content-addressed on-disk cache of static responses, keyed by URL, with LRU eviction."""
+
+    def __init__(self, directory: str = ".asset_cache", max_bytes: int = 200 * 1024 * 1024,
+                 max_age: float = 24 * 3600):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self.bytes_served = 0
+
+        self._blob_dir = os.path.join(directory, "blobs")
+        os.makedirs(self._blob_dir, exist_ok=True)
+        self._index_path = os.path.join(directory, "index.json")
+        self._index = self._load_index()
+
+    def _load_index(self) -> dict:
+        if not os.path.exists(self._index_path):
+            return {}
+        try:
+            with open(self._index_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            log_event(f"WARNING: Ignoring unreadable asset cache index: {str(e)}")
+            return {}
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self._blob_dir, digest)
+
+    async def get(self, url: str):
+        """Return (status, headers, body) for a fresh cached URL, or None."""
+        entry = self._index.get(url)
+        # Entries from before freshness was recorded fall back to max_age
+        if entry is None or time.time() - entry["stored"] > entry.get("fresh_for", self.max_age):
+            self.misses += 1
+            return None
+        try:
+            body = await _in_thread(_read_file, self._blob_path(entry["digest"]))
+        except OSError:
+            self._index.pop(url, None)
+            self.misses += 1
+            return None
+        entry["last_used"] = time.time()
+        self.hits += 1
+        self.bytes_served += len(body)
+        return entry["status"], entry["headers"], body
+
+    async def put(self, url: str, status: int, headers: dict, body: bytes):
+        """Store a response for as long as it stays fresh; identical bodies from different URLs share one blob."""
+        fresh_for = min(self.max_age, freshness_lifetime(headers, self.max_age))
+        if fresh_for <= 0:
+            return
+        digest = await _in_thread(self._write_blob, body)
+        now = time.time()
+        self._index[url] = {
+            "digest": digest,
+            "size": len(body),
+            "status": status,
+            "headers": {key: value for key, value in headers.items() if key.lower() not in _DROPPED_HEADERS},
+            "stored": now,
+            "last_used": now,
+            "fresh_for": fresh_for,
+        }
+        evicted = self._evict()
+        if evicted:
+            await _in_thread(self._remove_blobs, evicted)
+
+    def _write_blob(self, body: bytes) -> str:
+        # Runs on a worker thread
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._blob_path(digest)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.{id(body)}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        return digest
+
+    def _remove_blobs(self, digests: list):
+        for digest in digests:
+            try:
+                os.remove(self._blob_path(digest))
+            except OSError:
+                pass
+
+    def _evict(self) -> list:
+        """Drop least recently used entries from the index until it fits; returns the blobs to delete."""
+        # Size counts each blob once, however many URLs point at it
+        sizes = {entry["digest"]: entry["size"] for entry in self._index.values()}
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return []
+        evicted = []
+        references = Counter(entry["digest"] for entry in self._index.values())
+        for url, entry in sorted(self._index.items(), key=lambda item: item[1]["last_used"]):
+            del self._index[url]
+            digest = entry["digest"]
+            references[digest] -= 1
+            if references[digest] > 0:
+                continue
+            total -= sizes[digest]
+            evicted.append(digest)
+            if total <= self.max_bytes:
+                break
+        return evicted
+
+    def save(self):
+        """Persist the index so the next run can reuse the cached assets.
+
+        Other processes (batch workers) may have saved the same index since it was loaded, so
+        their entries are merged in rather than overwritten: the newer entry wins per URL, and
+        entries whose blob another process evicted are dropped.
+        """
+        with file_lock(self._index_path):
+            for url, entry in self._load_index().items():
+                ours = self._index.get(url)
+                if ours is None:
+                    if os.path.exists(self._blob_path(entry["digest"])):
+                        self._index[url] = entry
+                elif entry["stored"] > ours["stored"]:
+                    entry["last_used"] = max(entry["last_used"], ours["last_used"])
+                    self._index[url] = entry
+                else:
+                    ours["last_used"] = max(entry["last_used"], ours["last_used"])
+            self._remove_blobs(self._evict())
+            tmp_path = f"{self._index_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index, f)
+            os.replace(tmp_path, self._index_path)
+
+
+def _is_cacheable(request, response_headers: dict) -> bool:
+    if request.method != "GET" or request.resource_type not in CACHEABLE_RESOURCE_TYPES:
+        return False
+    cache_control = response_headers.get("cache-control", "").lower()
+    return "no-store" not in cache_control and "private" not in cache_control
+
+
+async def install_routes(context, policy: NetworkPolicy = None, cache: AssetCache = None):
+    """Route every request of a browser context through the blocking policy and asset cache."""
+    if policy is None and cache is None:
+        return
+
+    async def handle(route):
+        request = route.request
+        if policy is not None and policy.should_block(request):
+            policy.blocked += 1
+            await route.abort("blockedbyclient")
+            return
+
+        if cache is None or request.method != "GET" or request.resource_type not in CACHEABLE_RESOURCE_TYPES:
+            await route.continue_()
+            return
+
+        cached = await cache.get(request.url)
+        if cached is not None:
+            status, headers, body = cached
+            await route.fulfill(status=status, headers=headers, body=body)
+            return
+
+        try:
+            response = await route.fetch()
+            body = await response.body()
+        except Exception:
+            await route.abort("failed")
+            return
+        if response.status == 200 and _is_cacheable(request, response.headers):
+            await cache.put(request.url, response.status, response.headers, body)
+        await route.fulfill(response=response, body=body)
+
+    await context.route("**/*", handle)
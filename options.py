@@ -0,0 +1,265 @@
+# Engine configuration and the command line options shared by the entry points
+#
+# Config is the typed form of every engine option, parsed once and read
+# everywhere; code that runs tasks in-process (api.py) builds one directly.
+# main.py (one run of ad-hoc queries) and batch.py (a task file sharded across
+# processes) drive the same engine, so they share its options: entry points add
+# their own arguments to the parser and call finalize() to get the Config.
+# Only light modules are imported here, so parsing and checking a
+# configuration never pays for Playwright, the OpenAI SDK or asyncio.
+import argparse
+from dataclasses import dataclass, field, fields
+
+import event_log
+import network
+
+ARTIFACT_LAYOUTS = ("dir", "zip")
+
+# Model response cache (response_cache.py); "off" leaves the live client unwrapped
+MODEL_CACHE_MODES = ("off", "record", "replay")
+MODEL_CACHE_MATCHES = ("exact", "perceptual")
+
+SCREENSHOT_FORMATS = ("png", "jpeg", "webp")
+
+# Limits a task's own "budget" may set; see metrics.Budget
+TASK_BUDGET_LIMITS = ("max_tokens", "max_cost", "max_seconds")
+
+DEFAULT_MODEL = "computer-use-preview"
+DEFAULT_VIEWPORT = {"width": 1024, "height": 768}
+
+
+def parse_resolution(value: str) -> dict:
+    """Parse "WIDTHxHEIGHT" into a viewport-style dict; an empty value means None."""
+    if not value:
+        return None
+    width, height = value.lower().split("x")
+    return {"width": int(width), "height": int(height)}
+
+
+def format_resolution(resolution: dict) -> str:
+    return f"{resolution['width']}x{resolution['height']}" if resolution else ""
+
+
+@dataclass
+class Config:
+    """Every engine option; field names match the command line options."""
+
+    # Tasks and browser
+    start_url: str = "https://www.bing.com"
+    concurrency: int = 4
+    max_iterations: int = 3
+    headless: bool = False
+    viewport: dict = field(default_factory=lambda: dict(DEFAULT_VIEWPORT))
+    connect: str = None
+    context_max_uses: int = 20
+    # Network
+    block_resource_types: list = field(default_factory=lambda: list(network.DEFAULT_BLOCKED_RESOURCE_TYPES))
+    block_domains: list = field(default_factory=lambda: list(network.DEFAULT_BLOCKED_DOMAINS))
+    asset_cache_dir: str = ".asset_cache"
+    asset_cache_max_mb: int = 200
+    selector_memory: str = ".selector_memory.json"
+    selector_memory_ttl_hours: float = 168
+    # Model
+    model: str = DEFAULT_MODEL
+    model_cache: str = "off"
+    model_cache_dir: str = ".model_cache"
+    model_cache_match: str = "exact"
+    model_max_retries: int = 4
+    model_hedge_percentile: float = 0
+    model_stream: bool = False
+    model_max_connections: int = 50
+    model_timeout: float = 120.0
+    acknowledge_safety_checks: bool = False
+    # Pacing and timeouts
+    fast: bool = False
+    no_speculation: bool = False
+    settle_timeout: float = 10.0
+    navigation_timeout: float = 60.0
+    # Artifacts and screenshots
+    artifact_dir: str = ".artifacts"
+    artifact_layout: str = "dir"
+    artifact_keep_last: int = 0
+    artifact_only_on_failure: bool = False
+    artifact_max_mb: int = 500
+    playwright_trace: bool = False
+    screenshot_format: str = "png"
+    screenshot_quality: int = 80
+    keep_duplicate_frames: bool = False
+    # Model input
+    model_resolution: dict = None
+    model_crop_changes: bool = False
+    model_min_psnr: float = 35.0
+    # Budgets and metrics
+    max_task_tokens: int = 0
+    max_task_cost: float = 0.0
+    max_task_seconds: float = 0.0
+    pricing_file: str = None
+    metrics_file: str = "metrics.jsonl"
+    # Tracing and logging
+    trace: str = None
+    log_file: str = "log.jsonl"
+    log_level: str = "INFO"
+    log_flush_interval: float = 1.0
+    log_max_bytes: int = 10 * 1024 * 1024
+
+    def validate(self) -> list:
+        """Problems with the values, as messages; empty when the config is usable."""
+        problems = []
+        choices = {"model_cache": MODEL_CACHE_MODES, "model_cache_match": MODEL_CACHE_MATCHES,
+                   "artifact_layout": ARTIFACT_LAYOUTS, "screenshot_format": SCREENSHOT_FORMATS,
+                   "log_level": tuple(event_log.LEVELS)}
+        for name, allowed in choices.items():
+            if getattr(self, name) not in allowed:
+                problems.append(f"{name} must be one of {', '.join(allowed)}, not {getattr(self, name)!r}")
+        for name in ("concurrency", "max_iterations", "context_max_uses", "settle_timeout",
+                     "navigation_timeout", "model_timeout", "model_max_connections"):
+            if getattr(self, name) <= 0:
+                problems.append(f"{name} must be positive")
+        for name in ("viewport", "model_resolution"):
+            resolution = getattr(self, name)
+            if resolution is not None and (resolution.get("width", 0) <= 0 or resolution.get("height", 0) <= 0):
+                problems.append(f"{name} needs a positive width and height")
+        if not 0 <= self.screenshot_quality <= 100:
+            problems.append("screenshot_quality must be between 0 and 100")
+        return problems
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def validate_task(task: dict) -> list:
+    """Problems with the options a task sets for itself (budget, max_iterations), as messages."""
+    problems = []
+    budget = task.get("budget", {})
+    if not isinstance(budget, dict):
+        problems.append("budget must be an object")
+    else:
+        unknown = set(budget) - set(TASK_BUDGET_LIMITS)
+        if unknown:
+            problems.append(f"unknown budget limits {', '.join(sorted(unknown))} "
+                            f"(expected {', '.join(TASK_BUDGET_LIMITS)})")
+        for name in TASK_BUDGET_LIMITS:
+            if name in budget and not (_is_number(budget[name]) and budget[name] >= 0):
+                problems.append(f"budget {name} must be a number of at least 0")
+    if "max_iterations" in task:
+        value = task["max_iterations"]
+        if not (isinstance(value, int) and not isinstance(value, bool) and value > 0):
+            problems.append("max_iterations must be a positive integer")
+    return problems
+
+
+def build_parser(description: str) -> argparse.ArgumentParser:
+    """Parser with every engine option; callers add their own arguments."""
+    defaults = Config()
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--start-url", default=defaults.start_url,
+                        help="Page every task starts from")
+    parser.add_argument("--concurrency", type=int, default=defaults.concurrency,
+                        help="Maximum number of tasks running at once, each in its own browser context")
+    parser.add_argument("--max-iterations", type=int, default=defaults.max_iterations,
+                        help="Maximum model calls per task")
+    parser.add_argument("--headless", action="store_true",
+                        help="Run Chromium without a visible window")
+    parser.add_argument("--viewport", type=parse_resolution, default=format_resolution(defaults.viewport),
+                        metavar="WIDTHxHEIGHT",
+                        help="Browser viewport size")
+    parser.add_argument("--connect", metavar="ENDPOINT",
+                        help="Attach to a warm browser started by browser_daemon.py (e.g. http://localhost:9222)")
+    parser.add_argument("--context-max-uses", type=int, default=defaults.context_max_uses,
+                        help="Recycle a pooled browser context after this many tasks")
+    parser.add_argument("--block-resource-types", default=",".join(defaults.block_resource_types),
+                        help="Comma-separated resource types to abort (e.g. image,font,media); empty to block none")
+    parser.add_argument("--allow-ad-domains", action="store_true",
+                        help="Don't block requests to known ad and analytics domains")
+    parser.add_argument("--asset-cache-dir", default=defaults.asset_cache_dir,
+                        help="Persistent cache for static assets across runs; empty to disable")
+    parser.add_argument("--asset-cache-max-mb", type=int, default=defaults.asset_cache_max_mb,
+                        help="Evict least recently used assets once the cache exceeds this size")
+    parser.add_argument("--selector-memory", default=defaults.selector_memory,
+                        help="File remembering which search box/button selector worked per site; empty to disable")
+    parser.add_argument("--selector-memory-ttl-hours", type=float, default=defaults.selector_memory_ttl_hours,
+                        help="Re-probe all candidates once a remembered selector is older than this")
+    parser.add_argument("--model", default=defaults.model,
+                        help="Model (Azure deployment) name for the computer-use calls")
+    parser.add_argument("--model-cache", default=defaults.model_cache, choices=MODEL_CACHE_MODES,
+                        help="Record model responses to disk, or replay them and call the live model only on a miss")
+    parser.add_argument("--model-cache-dir", default=defaults.model_cache_dir,
+                        help="Directory holding recorded model responses")
+    parser.add_argument("--model-cache-match", default=defaults.model_cache_match, choices=MODEL_CACHE_MATCHES,
+                        help="Match screenshots by exact hash or by perceptual hash (needs Pillow)")
+    parser.add_argument("--model-max-retries", type=int, default=defaults.model_max_retries,
+                        help="Retry throttled (429) and failed (5xx) model calls this many times with jittered backoff")
+    parser.add_argument("--model-hedge-percentile", type=float, default=defaults.model_hedge_percentile,
+                        help="Send a duplicate request once a model call is slower than this percentile of recent calls (0: off)")
+    parser.add_argument("--model-stream", action="store_true",
+                        help="Stream model responses and start executing each action as soon as it arrives")
+    parser.add_argument("--model-max-connections", type=int, default=defaults.model_max_connections,
+                        help="Size of the HTTP connection pool shared by all tasks")
+    parser.add_argument("--model-timeout", type=float, default=defaults.model_timeout,
+                        help="Seconds before a model request times out")
+    parser.add_argument("--acknowledge-safety-checks", action="store_true",
+                        help="Acknowledge the model's safety checks (suspected prompt injection, irrelevant or "
+                             "sensitive domains) and carry on; by default a task stops at the first one")
+    parser.add_argument("--fast", action="store_true",
+                        help="Skip the cosmetic pauses that only exist so a human can read the status overlay")
+    parser.add_argument("--no-speculation", action="store_true",
+                        help="Don't pre-capture the next screenshot or preconnect to result hosts while waiting for the model")
+    parser.add_argument("--settle-timeout", type=float, default=defaults.settle_timeout,
+                        help="Maximum seconds to wait for the page to settle after navigation or an action")
+    parser.add_argument("--navigation-timeout", type=float, default=defaults.navigation_timeout,
+                        help="Seconds to wait for the start page to load")
+    parser.add_argument("--artifact-dir", default=defaults.artifact_dir,
+                        help="Directory screenshots and traces are kept in, one entry per task")
+    parser.add_argument("--artifact-layout", default=defaults.artifact_layout, choices=ARTIFACT_LAYOUTS,
+                        help="Keep each task's frames as a directory or pack them into one zip when it finishes")
+    parser.add_argument("--artifact-keep-last", type=int, default=defaults.artifact_keep_last, metavar="N",
+                        help="Keep only each task's last N frames (0 keeps all)")
+    parser.add_argument("--artifact-only-on-failure", action="store_true",
+                        help="Hold frames in memory and only write them if the task fails or does not complete")
+    parser.add_argument("--artifact-max-mb", type=int, default=defaults.artifact_max_mb,
+                        help="Evict the oldest task artifacts once the artifact directory exceeds this size (0: no cap)")
+    parser.add_argument("--playwright-trace", action="store_true",
+                        help="Record a Playwright trace per task (screenshots and DOM snapshots) instead of separate frames")
+    parser.add_argument("--screenshot-format", default=defaults.screenshot_format, choices=SCREENSHOT_FORMATS,
+                        help="Image format for screenshots; jpeg is also what the model receives, webp needs Pillow")
+    parser.add_argument("--screenshot-quality", type=int, default=defaults.screenshot_quality,
+                        help="JPEG/WebP quality (0-100)")
+    parser.add_argument("--keep-duplicate-frames", action="store_true",
+                        help="Write every screenshot, even when it looks the same as the task's previous one")
+    parser.add_argument("--model-resolution", type=parse_resolution, default=format_resolution(defaults.model_resolution),
+                        metavar="WIDTHxHEIGHT",
+                        help="Downscale screenshots to this size before sending them to the model (default: viewport size)")
+    parser.add_argument("--model-crop-changes", action="store_true",
+                        help="Only send the region that changed since the previous screenshot")
+    parser.add_argument("--model-min-psnr", type=float, default=defaults.model_min_psnr,
+                        help="Send the smallest encoding whose PSNR (dB) against the screenshot is at least this")
+    parser.add_argument("--max-task-tokens", type=int, default=defaults.max_task_tokens,
+                        help="Stop a task once its model calls used this many tokens (0: unlimited)")
+    parser.add_argument("--max-task-cost", type=float, default=defaults.max_task_cost,
+                        help="Stop a task once its model calls cost this many dollars (0: unlimited)")
+    parser.add_argument("--max-task-seconds", type=float, default=defaults.max_task_seconds,
+                        help="Stop a task after this many seconds (0: unlimited); past 75%% of any budget requests get cheaper")
+    parser.add_argument("--pricing-file",
+                        help="JSON file of per-model prices in USD per million tokens, e.g. {\"computer-use-preview\": {\"input\": 3, \"output\": 12}}")
+    parser.add_argument("--metrics-file", default=defaults.metrics_file,
+                        help="JSON Lines file for per-call and per-task token, latency and cost records; empty to disable")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Record phase spans and write them as Chrome trace_event JSON (view in Perfetto)")
+    parser.add_argument("--log-file", default=defaults.log_file,
+                        help="JSON Lines log file")
+    parser.add_argument("--log-level", default=defaults.log_level, choices=list(event_log.LEVELS),
+                        help="Minimum level written to the log")
+    parser.add_argument("--log-flush-interval", type=float, default=defaults.log_flush_interval,
+                        help="Seconds between batched log writes")
+    parser.add_argument("--log-max-bytes", type=int, default=defaults.log_max_bytes,
+                        help="Rotate the log file once it reaches this size")
+    return parser
+
+
+def finalize(args) -> Config:
+    """Turn the parsed options into the Config the engine reads; entry-point arguments are left out."""
+    values = {spec.name: getattr(args, spec.name) for spec in fields(Config) if hasattr(args, spec.name)}
+    values["block_resource_types"] = [name for name in args.block_resource_types.split(",") if name]
+    values["block_domains"] = [] if args.allow_ad_domains else list(network.DEFAULT_BLOCKED_DOMAINS)
+    return Config(**values)
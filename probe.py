@@ -0,0 +1,126 @@
+# Batched selector probing for search box and button detection
+#
+# Instead of asking the browser about each candidate selector one CDP call at a
+# time, the whole candidate list is shipped to the page in a single
+# page.evaluate call. The page scores every selector, tags the winning element
+# of each group with a data attribute and sends back one ranked result list per
+# group, so the fill/submit phase can act on the winner directly.
+
+PROBE_MARKER = "data-cua-probe"
+
+PROBE_SCRIPT = '''({ groups, marker }) => {
+    const NON_TEXT_TYPES = ['hidden', 'submit', 'button', 'checkbox', 'radio', 'image', 'reset', 'file'];
+
+    const isVisible = el => {
+        const rect = el.getBoundingClientRect();
+        if (rect.width <= 0 || rect.height <= 0) return false;
+        const style = window.getComputedStyle(el);
+        return style.visibility !== 'hidden' && style.display !== 'none';
+    };
+
+    const isEditable = el => {
+        if (el.disabled || el.readOnly) return false;
+        if (el.tagName === 'TEXTAREA' || el.isContentEditable) return true;
+        if (el.tagName !== 'INPUT') return false;
+        return !NON_TEXT_TYPES.includes((el.getAttribute('type') || 'text').toLowerCase());
+    };
+
+    const mentionsSearch = el => {
+        const text = [
+            el.getAttribute('aria-label'),
+            el.getAttribute('placeholder'),
+            el.getAttribute('title'),
+        ].filter(Boolean).join(' ').toLowerCase();
+        return text.includes('search');
+    };
+
+    const inViewport = rect =>
+        rect.bottom > 0 && rect.right > 0 &&
+        rect.top < window.innerHeight && rect.left < window.innerWidth;
+
+    const scoreElement = (kind, el) => {
+        if (!isVisible(el)) return 0;
+        const type = (el.getAttribute('type') || '').toLowerCase();
+        let score = 10;
+        if (kind === 'input') {
+            if (!isEditable(el)) return 0;
+            if (type === 'search' || el.getAttribute('name') === 'q') score += 5;
+        } else {
+            if (el.disabled) return 0;
+            if (el.tagName === 'BUTTON' || type === 'submit') score += 5;
+        }
+        if (mentionsSearch(el)) score += 3;
+        if (el.closest('form')) score += 2;
+        if (inViewport(el.getBoundingClientRect())) score += 2;
+        return score;
+    };
+
+    const results = {};
+    for (const [kind, selectors] of Object.entries(groups)) {
+        // Clear the tag left behind by a previous probe of this group
+        document.querySelectorAll(`[${marker}="${kind}"]`).forEach(el => el.removeAttribute(marker));
+
+        const winners = new Map();
+        const ranked = selectors.map((selector, index) => {
+            let elements;
+            try {
+                elements = Array.from(document.querySelectorAll(selector));
+            } catch (e) {
+                return { selector, index, count: 0, visible: false, score: 0, error: String(e) };
+            }
+
+            let best = null;
+            let bestScore = -1;
+            for (const el of elements) {
+                const score = scoreElement(kind, el);
+                if (score > bestScore) {
+                    best = el;
+                    bestScore = score;
+                }
+            }
+            if (!best) {
+                return { selector, index, count: 0, visible: false, score: 0 };
+            }
+
+            const rect = best.getBoundingClientRect();
+            winners.set(index, best);
+            return {
+                selector,
+                index,
+                count: elements.length,
+                visible: isVisible(best),
+                box: { x: rect.x, y: rect.y, width: rect.width, height: rect.height },
+                tag: best.tagName,
+                id: best.id,
+                name: best.getAttribute('name'),
+                type: best.getAttribute('type'),
+                value: best.value,
+                score: bestScore,
+            };
+        });
+
+        ranked.sort((a, b) => b.score - a.score || a.index - b.index);
+        if (ranked.length && ranked[0].score > 0) {
+            winners.get(ranked[0].index).setAttribute(marker, kind);
+        }
+        results[kind] = ranked;
+    }
+    return results;
+}'''
+
+
+async def probe_selectors(page, groups: dict) -> dict:
+    """Probe groups of candidate selectors in one round-trip and return ranked results per group."""
+    return await page.evaluate(PROBE_SCRIPT, {"groups": groups, "marker": PROBE_MARKER})
+
+
+def best_match(results: list):
+    """Return the top-ranked usable result from a probe group, or None."""
+    if results and results[0]["score"] > 0:
+        return results[0]
+    return None
+
+
+def winner_selector(kind: str) -> str:
+    """Selector that targets the element tagged as the winner of a probe group."""
+    return f'[{PROBE_MARKER}="{kind}"]'
@@ -0,0 +1,160 @@
+# Offline record/replay cache for computer-use model responses
+#
+# Wraps the model client so every responses.create call is stored on disk
+# together with a key derived from the request (prompt, tools, options, with
+# each screenshot reduced to a hash). In replay mode a stored response is served
+# without touching the network and the live client is only created and called
+# on a cache miss, so a recorded scenario can be rerun at local speed.
+#
+# Lookups are either exact (screenshots compared by SHA-256) or perceptual
+# (screenshots compared by an average hash within a Hamming distance). The
+# perceptual mode needs Pillow; without it lookups fall back to exact.
+import base64
+import hashlib
+import io
+import json
+import os
+
+from event_log import log_event
+from responses_namespace import ResponsesNamespace
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+def average_hash(image_bytes: bytes, size: int = 16) -> int:
+    """Perceptual hash: one bit per pixel of a size x size grayscale thumbnail, set if above the mean."""
+    image = Image.open(io.BytesIO(image_bytes)).convert("L").resize((size, size))
+    pixels = list(image.getdata())
+    mean = sum(pixels) / len(pixels)
+    bits = 0
+    for pixel in pixels:
+        bits = (bits << 1) | (pixel > mean)
+    return bits
+
+
+def _split_images(value, images: list):
+    """Copy a request with every inline image replaced by a placeholder, collecting the images."""
+    if isinstance(value, dict):
+        return {key: _split_images(item, images) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_split_images(item, images) for item in value]
+    if isinstance(value, str) and value.startswith("data:image/"):
+        images.append(base64.b64decode(value.split(",", 1)[1]))
+        return f"<image {len(images) - 1}>"
+    return value
+
+
+def _digest(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class RecordingClient:
+    """Drop-in wrapper for the async model client that records and replays responses."""
+
+    def __init__(self, client_factory, store_dir: str = ".model_cache", mode: str = "record",
+                 match: str = "exact", max_distance: int = 10, stream: bool = False):
+        self._client_factory = client_factory
+        self._client = None
+        self.store_dir = store_dir
+        self.mode = mode
+        self.match = match
+        if match == "perceptual" and Image is None:
+            log_event("WARNING: Pillow is not installed, falling back to exact screenshot matching")
+            self.match = "exact"
+        self.max_distance = max_distance
+        # Whether the live client streams, so callers hand create() an on_output_item callback
+        self.stream = stream
+        self.hits = 0
+        self.misses = 0
+        self.responses = ResponsesNamespace(self)
+
+        os.makedirs(store_dir, exist_ok=True)
+        self._index_path = os.path.join(store_dir, "index.jsonl")
+        self._index = []
+        if os.path.exists(self._index_path):
+            with open(self._index_path, encoding="utf-8") as f:
+                self._index = [json.loads(line) for line in f if line.strip()]
+        self._by_key = {entry["exact_key"]: entry for entry in self._index}
+
+    def _live_client(self):
+        # Created lazily so a fully cached replay needs no credentials or network
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def _keys(self, request: dict):
+        images = []
+        structure = _split_images(request, images)
+        structural_key = _digest(structure)
+        image_hashes = [hashlib.sha256(image).hexdigest() for image in images]
+        exact_key = _digest({"request": structure, "images": image_hashes})
+        phashes = [average_hash(image) for image in images] if self.match == "perceptual" else []
+        return structure, exact_key, structural_key, phashes
+
+    def _lookup(self, exact_key: str, structural_key: str, phashes: list):
+        if exact_key in self._by_key:
+            return self._by_key[exact_key]
+        if self.match != "perceptual":
+            return None
+        # Same prompt and tools, screenshots that merely look the same
+        best, best_distance = None, None
+        for entry in self._index:
+            if entry["structural_key"] != structural_key or len(entry.get("phashes", [])) != len(phashes):
+                continue
+            distance = max((bin(a ^ b).count("1") for a, b in zip(entry["phashes"], phashes)), default=0)
+            if distance <= self.max_distance and (best_distance is None or distance < best_distance):
+                best, best_distance = entry, distance
+        return best
+
+    def _load(self, entry: dict):
+        from openai.types.responses import Response
+        with open(os.path.join(self.store_dir, entry["file"]), encoding="utf-8") as f:
+            data = json.load(f)["response"]
+        # Built leniently, like the SDK builds live responses: a recorded response may lack fields
+        # (or hold nulls) that strict validation would reject
+        return Response.construct(**data)
+
+    def _store(self, structure: dict, response, exact_key: str, structural_key: str, phashes: list):
+        file_name = f"{exact_key}.json"
+        with open(os.path.join(self.store_dir, file_name), "w", encoding="utf-8") as f:
+            json.dump({"request": structure, "response": response.model_dump(mode="json")}, f)
+        if exact_key in self._by_key:
+            return
+        entry = {"exact_key": exact_key, "structural_key": structural_key, "phashes": phashes, "file": file_name}
+        self._index.append(entry)
+        self._by_key[exact_key] = entry
+        with open(self._index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    async def create(self, on_output_item=None, **kwargs):
+        """Serve a stored response in replay mode, otherwise call the live model and store the result.
+
+        on_output_item is passed on to a streaming live client and is not part of the cache key. A replayed
+        response arrives whole, so its items are left to the caller; it is marked with from_cache=True.
+        """
+        structure, exact_key, structural_key, phashes = self._keys(kwargs)
+        if self.mode == "replay":
+            entry = self._lookup(exact_key, structural_key, phashes)
+            if entry is not None:
+                self.hits += 1
+                log_event(f"INFO: Model cache hit ({entry['file']})")
+                response = self._load(entry)
+                # Replayed calls cost nothing; see metrics.TaskUsage.record
+                response.from_cache = True
+                return response
+            self.misses += 1
+            log_event("INFO: Model cache miss, calling the live model")
+
+        if on_output_item is not None:
+            response = await self._live_client().responses.create(on_output_item=on_output_item, **kwargs)
+        else:
+            response = await self._live_client().responses.create(**kwargs)
+        self._store(structure, response, exact_key, structural_key, phashes)
+        return response
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
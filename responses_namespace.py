@@ -0,0 +1,16 @@
+# The client.responses namespace for model client wrappers
+#
+# The agent calls client.responses.create(...) like the OpenAI SDK. Wrappers
+# and stand-ins (the record/replay cache, the resilient client, the stub
+# model) implement a single create() coroutine and expose it through this
+# namespace, so they can be swapped for the SDK client and for each other.
+
+
+class ResponsesNamespace:
+    """Forwards responses.create(**kwargs) to its owner's create()."""
+
+    def __init__(self, owner):
+        self._owner = owner
+
+    async def create(self, **kwargs):
+        return await self._owner.create(**kwargs)
@@ -0,0 +1,205 @@
+# Screenshot capture pipeline
+#
+# Screenshots are captured as bytes and the event loop moves on straight away;
+# encoding and writing to disk happen on a small thread pool fed through a
+# bounded queue, so a burst of captures applies backpressure instead of piling
+# up in memory. Different tasks write in parallel, but one task's frames are
+# written one after another in capture order, so they are numbered, compared
+# for dedup and rotated out of the ring in that order. PNG and JPEG are encoded by the browser itself, WebP is
+# re-encoded from the PNG capture in the writer thread (needs Pillow). A frame
+# that looks the same as the task's previous frame (same perceptual hash) is
+# not written again. Frames go to the task's slot in the artifact store
+# (artifacts.py), which bounds how many are kept. The captured bytes are
+# returned to the caller, so the frame sent to the model is the same buffer
+# and never captured twice. Each engine has its own service and makes it the
+# current one for the tasks it runs, so engines in one process don't share it.
+import asyncio
+import contextvars
+import hashlib
+import io
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from artifacts import ArtifactStore
+from event_log import get_logger, log_event
+from tracing import span
+
+# WebP encoding and perceptual dedup need Pillow; without it WebP falls back to
+# PNG and dedup only skips byte-identical frames.
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+if Image is not None:
+    from response_cache import average_hash
+
+MIME_TYPES = {"png": "image/png", "jpeg": "image/jpeg"}
+
+
+class CaptureService:
+    """Captures page screenshots as bytes and stores them in the background.
+
+    With keep_frames=False frames are only captured, not stored (a Playwright trace records them instead).
+    """
+
+    def __init__(self, store: ArtifactStore = None, image_format: str = "png", quality: int = 80,
+                 dedup: bool = True, max_distance: int = 0, workers: int = 2, max_pending: int = 32,
+                 keep_frames: bool = True):
+        if image_format == "webp" and Image is None:
+            log_event("WARNING: Pillow is not installed, writing screenshots as PNG instead of WebP")
+            image_format = "png"
+        self.store = store or ArtifactStore()
+        self.keep_frames = keep_frames
+        self.image_format = image_format
+        self.quality = quality
+        self.dedup = dedup
+        self.max_distance = max_distance
+        self.written = 0
+        self.skipped = 0
+        self.bytes_written = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="screenshot")
+        self._slots = asyncio.Semaphore(max_pending)
+        self._pending = set()
+        # Task id -> hash of the last frame written for it
+        self._last_hash = {}
+        # Task id -> its most recently queued write, which the next one waits for
+        self._tails = {}
+
+    @property
+    def capture_type(self) -> str:
+        """Format the browser encodes to; WebP is captured as PNG and converted when written."""
+        return "jpeg" if self.image_format == "jpeg" else "png"
+
+    @property
+    def mime_type(self) -> str:
+        """MIME type of the bytes returned by capture()."""
+        return MIME_TYPES[self.capture_type]
+
+    @property
+    def extension(self) -> str:
+        return "jpg" if self.image_format == "jpeg" else self.image_format
+
+    async def capture(self, page, task: dict, name: str, clip: dict = None, keep: bool = True) -> bytes:
+        """Take a screenshot, queue it for writing and return the captured bytes.
+
+        clip limits the capture to a page region ({"x", "y", "width", "height"}). With keep=False
+        the frame is only returned; keep() can still store it later, e.g. once a speculative
+        capture turns out to be used.
+        """
+        with span("screenshot", file=name):
+            options = {"type": self.capture_type}
+            if self.capture_type == "jpeg":
+                options["quality"] = self.quality
+            if clip is not None:
+                options["clip"] = clip
+            data = await page.screenshot(**options)
+            if keep:
+                await self.keep(task, name, data)
+            return data
+
+    async def keep(self, task: dict, name: str, data: bytes):
+        """Queue captured bytes for writing to the task's artifacts."""
+        if not self.keep_frames:
+            return
+        # Backpressure: wait for a free slot rather than queueing without bound
+        await self._slots.acquire()
+        task_id = task["id"]
+        future = asyncio.ensure_future(self._write_in_order(self._tails.get(task_id), task_id, name, data))
+        self._tails[task_id] = future
+        self._pending.add(future)
+        future.add_done_callback(self._finished)
+
+    async def _write_in_order(self, previous, task_id: str, name: str, data: bytes):
+        if previous is not None:
+            await asyncio.wait({previous})
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self._write, task_id, name, data)
+
+    def _finished(self, future):
+        self._pending.discard(future)
+        self._slots.release()
+        if not future.cancelled() and future.exception() is not None:
+            log_event(f"WARNING: Could not write screenshot: {str(future.exception())}")
+
+    def _frame_hash(self, data: bytes):
+        if Image is not None:
+            return average_hash(data)
+        return hashlib.sha256(data).digest()
+
+    def _is_duplicate(self, previous, current) -> bool:
+        if previous is None:
+            return False
+        if isinstance(current, int):
+            return bin(previous ^ current).count("1") <= self.max_distance
+        return previous == current
+
+    def _write(self, task_id: str, name: str, data: bytes):
+        # Runs on a writer thread, never concurrently with another write for the same task
+        if self.dedup:
+            frame_hash = self._frame_hash(data)
+            if self._is_duplicate(self._last_hash.get(task_id), frame_hash):
+                self.skipped += 1
+                get_logger().debug("Skipped duplicate screenshot", file=name)
+                return
+            self._last_hash[task_id] = frame_hash
+
+        if self.image_format == "webp":
+            output = io.BytesIO()
+            Image.open(io.BytesIO(data)).save(output, format="WEBP", quality=self.quality)
+            data = output.getvalue()
+        self.store.add(task_id, name, self.extension, data)
+        self.written += 1
+        self.bytes_written += len(data)
+
+    async def flush(self):
+        """Wait until every queued screenshot has been written."""
+        if self._pending:
+            await asyncio.gather(*list(self._pending), return_exceptions=True)
+
+    async def finish_task(self, task_id: str, failed: bool):
+        """Wait for the task's frames, then let the store archive or discard them."""
+        await self.flush()
+        self._last_hash.pop(task_id, None)
+        self._tails.pop(task_id, None)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._executor, self.store.finish_task, task_id, failed)
+
+    async def close(self):
+        await self.flush()
+        self._executor.shutdown(wait=True)
+        log_event(f"INFO: Screenshots: {self.written} written ({self.bytes_written / 1024:.0f} KiB), {self.skipped} duplicates skipped")
+
+
+_capture = None
+# The service of the engine running the current task, inherited by the tasks it starts
+_current = contextvars.ContextVar("capture_service", default=None)
+
+
+def configure(**kwargs) -> CaptureService:
+    """Create the process-wide capture service."""
+    global _capture
+    _capture = CaptureService(**kwargs)
+    return _capture
+
+
+@contextmanager
+def using(capture: CaptureService):
+    """Make capture the service get_capture() returns in this task, and in tasks started from it."""
+    token = _current.set(capture)
+    try:
+        yield capture
+    finally:
+        _current.reset(token)
+
+
+def get_capture() -> CaptureService:
+    """The current engine's capture service, or else the process-wide one."""
+    global _capture
+    capture = _current.get()
+    if capture is not None:
+        return capture
+    if _capture is None:
+        _capture = CaptureService()
+    return _capture
@@ -0,0 +1,85 @@
+# Learned selector memory
+#
+# Remembers which probe selector won for each site section (host plus first
+# path segment, e.g. "www.bing.com/search"), with a hit count and the time it
+# was last verified. The next visit tries the remembered selector first and only
+# falls back to probing the full candidate list when it is missing, no longer
+# visible or older than the TTL.
+import json
+import os
+import time
+from urllib.parse import urlparse
+
+from event_log import log_event
+from file_lock import file_lock
+
+
+def page_key(url: str) -> str:
+    """Host plus first path segment, so a site's home and results pages are remembered separately."""
+    parsed = urlparse(url)
+    first_segment = parsed.path.strip("/").split("/", 1)[0]
+    return f"{parsed.hostname or ''}/{first_segment}"
+
+
+class SelectorMemory:
+    """Persistent map of page key -> probe group -> winning selector."""
+
+    def __init__(self, path: str = ".selector_memory.json", ttl: float = 7 * 24 * 3600):
+        self.path = path
+        self.ttl = ttl
+        self._entries = self._load()
+        # (page key, probe group) -> when this process found the selector no longer works
+        self._forgotten = {}
+
+    def _load(self) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            log_event(f"WARNING: Ignoring unreadable selector memory: {str(e)}")
+            return {}
+
+    def lookup(self, url: str, kind: str):
+        """Remembered selector for this page and probe group, or None if unknown or expired."""
+        entry = self._entries.get(page_key(url), {}).get(kind)
+        if entry is None:
+            return None
+        if time.time() - entry["last_verified"] > self.ttl:
+            self.forget(url, kind)
+            return None
+        return entry["selector"]
+
+    def record(self, url: str, kind: str, selector: str):
+        """Note that selector just worked for this page and probe group."""
+        groups = self._entries.setdefault(page_key(url), {})
+        entry = groups.get(kind)
+        if entry is None or entry["selector"] != selector:
+            entry = groups[kind] = {"selector": selector, "hits": 0}
+        entry["hits"] += 1
+        entry["last_verified"] = time.time()
+
+    def forget(self, url: str, kind: str):
+        """Drop a remembered selector that no longer works."""
+        self._entries.get(page_key(url), {}).pop(kind, None)
+        self._forgotten[(page_key(url), kind)] = time.time()
+
+    def save(self):
+        """Write the memory, merged with whatever other processes (batch workers) saved meanwhile.
+
+        Per page and probe group the most recently verified selector wins; one this process
+        forgot stays forgotten unless another process verified it again afterwards.
+        """
+        with file_lock(self.path):
+            for key, groups in self._load().items():
+                ours = self._entries.setdefault(key, {})
+                for kind, entry in groups.items():
+                    if entry["last_verified"] <= self._forgotten.get((key, kind), 0):
+                        continue
+                    if kind not in ours or entry["last_verified"] > ours[kind]["last_verified"]:
+                        ours[kind] = entry
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, indent=2)
+            os.replace(tmp_path, self.path)
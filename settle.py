@@ -0,0 +1,126 @@
+# Event-driven page settling
+#
+# Replaces fixed time.sleep budgets with waits on real signals: the page load
+# state, DOM mutation quiescence (via a MutationObserver injected into the page),
+# no pending network requests and, after a search submit, a URL change. Every
+# wait is capped by a configurable timeout and returns as soon as the page is
+# ready, so a fast page costs milliseconds instead of seconds.
+import asyncio
+import time
+
+from tracing import span
+
+# Resolves true once the DOM has gone quietMs without a mutation, false on timeout
+DOM_QUIET_SCRIPT = '''({ quietMs, timeoutMs }) => new Promise(resolve => {
+    const start = performance.now();
+    let last = start;
+    const observer = new MutationObserver(() => { last = performance.now(); });
+    observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+    const check = () => {
+        const now = performance.now();
+        if (now - last >= quietMs) {
+            observer.disconnect();
+            resolve(true);
+        } else if (now - start >= timeoutMs) {
+            observer.disconnect();
+            resolve(false);
+        } else {
+            setTimeout(check, Math.min(50, quietMs));
+        }
+    };
+    setTimeout(check, quietMs);
+})'''
+
+# Long-lived connections never "finish", so they must not block settling
+IGNORED_RESOURCE_TYPES = {"websocket", "eventsource"}
+
+
+class SettleDetector:
+    """Waits for a page to settle on real load, DOM and network signals."""
+
+    def __init__(self, page, timeout: float = 10.0, quiet_period: float = 0.5,
+                 max_request_age: float = 5.0, fast: bool = False):
+        self.page = page
+        self.timeout = timeout
+        self.quiet_period = quiet_period
+        # Requests in flight for longer than this (beacons, long polling) are ignored
+        self.max_request_age = max_request_age
+        self.fast = fast
+        self._inflight = {}
+
+        page.on("request", self._on_request)
+        page.on("requestfinished", self._on_request_done)
+        page.on("requestfailed", self._on_request_done)
+
+    def detach(self):
+        """Stop tracking the page's requests, e.g. before the page is reused by another task."""
+        self.page.remove_listener("request", self._on_request)
+        self.page.remove_listener("requestfinished", self._on_request_done)
+        self.page.remove_listener("requestfailed", self._on_request_done)
+
+    def _on_request(self, request):
+        if request.resource_type not in IGNORED_RESOURCE_TYPES:
+            self._inflight[request] = time.monotonic()
+
+    def _on_request_done(self, request):
+        self._inflight.pop(request, None)
+
+    def pending_requests(self) -> int:
+        """Number of in-flight requests young enough to still count against settling."""
+        cutoff = time.monotonic() - self.max_request_age
+        return sum(1 for started in self._inflight.values() if started >= cutoff)
+
+    async def wait_for_settle(self, timeout: float = None, load_state: str = "domcontentloaded") -> bool:
+        """Wait until the load state is reached, the DOM is quiet and the network is idle.
+
+        Returns True if the page settled, False if the timeout ran out first.
+        """
+        with span("settle") as current:
+            settled = await self._wait_for_settle(timeout, load_state)
+            current.set(settled=settled)
+        return settled
+
+    async def _wait_for_settle(self, timeout: float, load_state: str) -> bool:
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+
+        def remaining_ms():
+            return max(0, int((deadline - time.monotonic()) * 1000))
+
+        try:
+            await self.page.wait_for_load_state(load_state, timeout=remaining_ms() or 1)
+        except Exception:
+            return False
+
+        quiet_ms = int(self.quiet_period * 1000)
+        while remaining_ms() > 0:
+            try:
+                dom_quiet = await self.page.evaluate(DOM_QUIET_SCRIPT, {"quietMs": quiet_ms, "timeoutMs": remaining_ms()})
+            except Exception:
+                # The execution context was replaced by a navigation; wait for the new document
+                try:
+                    await self.page.wait_for_load_state(load_state, timeout=remaining_ms() or 1)
+                except Exception:
+                    return False
+                continue
+
+            if dom_quiet and self.pending_requests() == 0:
+                return True
+            await asyncio.sleep(min(0.1, remaining_ms() / 1000))
+        return False
+
+    async def wait_for_url_change(self, old_url: str, timeout: float = None) -> bool:
+        """Wait until the page URL differs from old_url (e.g. after a search submit)."""
+        timeout = self.timeout if timeout is None else timeout
+        with span("settle.url_change") as current:
+            try:
+                await self.page.wait_for_url(lambda url: url != old_url, timeout=int(timeout * 1000),
+                                             wait_until="commit")
+                return True
+            except Exception:
+                current.set(changed=False)
+                return False
+
+    async def pause(self, seconds: float):
+        """Cosmetic pause so a human can read the status overlay; skipped in fast mode."""
+        if not self.fast:
+            await asyncio.sleep(seconds)
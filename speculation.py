@@ -0,0 +1,136 @@
+# Speculative work while the model is thinking
+#
+# The page sits idle for the seconds a model call takes, and afterwards the
+# loop used to capture a screenshot, read the URL and encode the frame one
+# after another. The Speculator starts that work as soon as the request is
+# sent: it captures the next candidate observation (screenshot, URL and a small
+# DOM summary), encodes the frame for the model and, on the search results
+# page, adds preconnect hints for the hosts the result links point at, so a
+# click on one of them skips DNS, TCP and TLS setup. When the response arrives
+# the observation is used only if it still shows the page: the model asked for
+# no actions and the page has not navigated since it was taken. Otherwise it is
+# dropped and the page is captured again as before.
+import asyncio
+from urllib.parse import urlparse
+
+import screenshots
+from event_log import log_event
+from tracing import span
+
+# One round trip: where the page is and which other origins its links point at.
+# With preconnect set, each of those origins also gets <link rel=preconnect>
+# and <link rel=dns-prefetch> hints in the document head.
+OBSERVE_SCRIPT = '''({ preconnect, maxHosts }) => {
+    const origins = [];
+    for (const link of document.querySelectorAll('a[href]')) {
+        let url;
+        try { url = new URL(link.href, location.href); } catch (e) { continue; }
+        if (!url.protocol.startsWith('http') || url.origin === location.origin || origins.includes(url.origin)) {
+            continue;
+        }
+        origins.push(url.origin);
+        if (origins.length >= maxHosts) break;
+    }
+    if (preconnect && document.head) {
+        for (const origin of origins) {
+            for (const rel of ['preconnect', 'dns-prefetch']) {
+                if (document.head.querySelector(`link[rel="${rel}"][href="${origin}"]`)) continue;
+                const hint = document.createElement('link');
+                hint.rel = rel;
+                hint.href = origin;
+                document.head.appendChild(hint);
+            }
+        }
+    }
+    return {
+        url: location.href,
+        title: document.title,
+        links: document.links.length,
+        origins,
+    };
+}'''
+
+
+def _drop(pending):
+    # Cancel a speculation nobody will use, without leaving its error unretrieved
+    if pending.done():
+        if not pending.cancelled():
+            pending.exception()
+    else:
+        pending.cancel()
+
+
+class Speculator:
+    """Per-task observation pre-capture and connection warming during model calls."""
+
+    def __init__(self, page, task: dict, optimizer, search_host: str = None, max_hosts: int = 6):
+        self.page = page
+        self.task = task
+        self.optimizer = optimizer
+        # Only the results page gets preconnect hints; an article's links are rarely the next click
+        self.search_host = search_host
+        self.max_hosts = max_hosts
+        self.used = 0
+        self.dropped = 0
+        self.preconnected = set()
+        self._navigations = 0
+        self._pending = None
+        page.on("framenavigated", self._on_navigated)
+
+    def detach(self):
+        self.cancel()
+        self.page.remove_listener("framenavigated", self._on_navigated)
+
+    def _on_navigated(self, frame):
+        if frame == self.page.main_frame:
+            self._navigations += 1
+
+    def start(self, name: str):
+        """Start observing the page in the background; call right after the model request is sent."""
+        self.cancel()
+        self._pending = asyncio.ensure_future(self._observe(name))
+
+    def cancel(self):
+        if self._pending is not None:
+            _drop(self._pending)
+            self._pending = None
+
+    async def _observe(self, name: str) -> dict:
+        navigations = self._navigations
+        preconnect = bool(self.search_host) and urlparse(self.page.url).hostname == self.search_host
+        capture = screenshots.get_capture()
+        with span("speculation"):
+            summary, screenshot = await asyncio.gather(
+                self.page.evaluate(OBSERVE_SCRIPT, {"preconnect": preconnect, "maxHosts": self.max_hosts}),
+                capture.capture(self.page, self.task, name, keep=False),
+            )
+            encoded = await self.optimizer.encode(screenshot, capture.mime_type)
+        if preconnect:
+            self.preconnected.update(summary["origins"])
+        return {"name": name, "screenshot": screenshot, "encoded": encoded, "summary": summary,
+                "navigations": navigations}
+
+    async def take(self, actions_ran: bool):
+        """The speculative observation if it still shows the page, else None.
+
+        A used observation's screenshot is stored like any other capture.
+        """
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return None
+        if actions_ran:
+            _drop(pending)
+            self.dropped += 1
+            return None
+        try:
+            observation = await pending
+        except Exception as e:
+            log_event(f"WARNING: Speculative capture failed: {str(e)}")
+            self.dropped += 1
+            return None
+        if observation["navigations"] != self._navigations or observation["summary"]["url"] != self.page.url:
+            self.dropped += 1
+            return None
+        self.used += 1
+        await screenshots.get_capture().keep(self.task, observation["name"], observation["screenshot"])
+        return observation
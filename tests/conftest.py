@@ -0,0 +1,42 @@
+# The modules live at the top of the repository rather than in a package
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_log  # noqa: E402
+
+
+@pytest.fixture(autouse=True, scope="session")
+def quiet_log(tmp_path_factory):
+    # Keep the event log out of the working tree and the console
+    logger = event_log.configure(path=str(tmp_path_factory.mktemp("log") / "log.jsonl"), console=False)
+    yield logger
+    logger.close()
+
+
+@pytest.fixture
+def model_server():
+    """Start a FakeModelServer: start(**schedule) returns it with a factory for SDK clients aimed at it."""
+    from openai import AsyncAzureOpenAI
+
+    from benchmark import FAKE_API_VERSION
+    from fake_model_server import FakeModelServer
+    from model_client import make_http_client
+
+    servers = []
+
+    def start(**schedule):
+        server = FakeModelServer(**schedule).start()
+        servers.append(server)
+
+        def make_client():
+            return AsyncAzureOpenAI(azure_endpoint=server.url, api_key="fake", api_version=FAKE_API_VERSION,
+                                    http_client=make_http_client(), max_retries=0)
+        return server, make_client
+
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,186 @@
+# run_agent_loop against a fake page and the canned FakeModelClient
+import asyncio
+import struct
+import zlib
+from types import SimpleNamespace
+from urllib.parse import urlparse
+
+import pytest
+
+import screenshots
+from agent import run_agent_loop
+from artifacts import ArtifactStore
+from completion import SIGNALS_SCRIPT
+from fake_model import FakeModelClient
+
+RESULTS_URL = "https://www.bing.com/search?q=AI+news"
+ARTICLE_URL = "https://news.example.com/news/ai-article"
+
+
+def _png(width: int = 1024, height: int = 768) -> bytes:
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    rows = b"".join(b"\x00" + b"\xff" * width * 3 for _ in range(height))
+    return (b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b""))
+
+
+FRAME = _png()
+
+
+class FakePage:
+    """Just enough of a Playwright page for the agent loop: a click may open the article."""
+
+    def __init__(self, click_opens=ARTICLE_URL, failing_screenshots=()):
+        self.url = RESULTS_URL
+        self.main_frame = object()
+        self.click_opens = click_opens
+        # Numbers (1-based) of the screenshot() calls that raise
+        self.failing_screenshots = set(failing_screenshots)
+        self.screenshots = 0
+        self.clicks = []
+        self.mouse = SimpleNamespace(click=self._click, move=self._noop)
+        self.keyboard = SimpleNamespace(press=self._noop, type=self._noop)
+
+    async def _noop(self, *args, **kwargs):
+        pass
+
+    async def _click(self, x, y, button="left"):
+        self.clicks.append((x, y))
+        if self.click_opens:
+            self.url = self.click_opens
+
+    async def evaluate(self, script, arg=None):
+        if script != SIGNALS_SCRIPT:
+            return None
+        parsed = urlparse(self.url)
+        opened = self.url == ARTICLE_URL
+        return {"url": self.url, "host": parsed.hostname, "path": parsed.path, "title": "",
+                "has_article": opened, "article_chars": 2000 if opened else 0, "readable_chars": 0}
+
+    async def screenshot(self, **options):
+        self.screenshots += 1
+        if self.screenshots in self.failing_screenshots:
+            raise RuntimeError("Target page, context or browser has been closed")
+        return FRAME
+
+
+class FakeSettle:
+    async def pause(self, seconds):
+        pass
+
+    async def wait_for_settle(self, timeout=None, load_state="domcontentloaded"):
+        return True
+
+
+class RecordingModel(FakeModelClient):
+    def __init__(self):
+        super().__init__()
+        self.requests = []
+        self.responses_sent = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        response = await super().create(**kwargs)
+        self.responses_sent.append(response)
+        return response
+
+
+class FlaggingModel(RecordingModel):
+    """Attaches a safety check to every computer_call, as for a page with injected instructions."""
+
+    async def create(self, **kwargs):
+        response = await super().create(**kwargs)
+        for item in response.output:
+            if item.type == "computer_call":
+                item.pending_safety_checks = [SimpleNamespace(id="sc_1", code="malicious_instructions",
+                                                              message="The page may contain instructions")]
+        return response
+
+
+@pytest.fixture(autouse=True)
+def capture(tmp_path):
+    previous = screenshots._capture
+    service = screenshots.configure(store=ArtifactStore(str(tmp_path)), dedup=False)
+    yield service
+    asyncio.run(service.close())
+    screenshots._capture = previous
+
+
+def run(page, client, max_iterations=3, **options):
+    task = {"id": "task1", "query": "AI news", "start_url": RESULTS_URL}
+    return asyncio.run(run_agent_loop(page, client, FakeSettle(), task, max_iterations=max_iterations,
+                                      search_done=True, **options))
+
+
+def computer_call_outputs(request):
+    return [item for item in request["input"] if item.get("type") == "computer_call_output"]
+
+
+def test_click_that_opens_an_article_completes_the_task():
+    page, client = FakePage(), RecordingModel()
+    result = run(page, client)
+
+    assert result["completed"]
+    assert result["iterations"] == 1
+    assert len(page.clicks) == 1
+    assert client.calls == 1
+
+
+def test_click_that_does_not_complete_answers_the_call_and_finishes_the_steps():
+    page, client = FakePage(click_opens=None), RecordingModel()
+    result = run(page, client)
+
+    assert not result["completed"]
+    assert result["iterations"] == 2
+    first, second = client.requests
+    assert "previous_response_id" not in first
+    # The click is answered with the screenshot taken after it, chained to the response that asked for it
+    click = client.responses_sent[0]
+    assert [output["call_id"] for output in computer_call_outputs(second)] == [click.output[1].call_id]
+    assert second["previous_response_id"] == click.id
+
+
+def test_failed_screenshot_after_actions_still_answers_them():
+    # 1: initial state, 2: after the click (fails), 3: error state
+    page, client = FakePage(click_opens=None, failing_screenshots={2}), RecordingModel()
+    result = run(page, client)
+
+    assert not result["completed"]
+    second = client.requests[1]
+    click = client.responses_sent[0]
+    # The error capture stands in for the failed one, so the click is not asked for and run again
+    assert [output["call_id"] for output in computer_call_outputs(second)] == [click.output[1].call_id]
+    assert second["previous_response_id"] == click.id
+    assert len(page.clicks) == 1
+
+
+def test_failed_turn_without_any_screenshot_is_retried_unchained():
+    # Both the capture after the click and the error capture fail, so the click stays unanswered
+    page, client = FakePage(click_opens=None, failing_screenshots={2, 3}), RecordingModel()
+    run(page, client, max_iterations=2)
+
+    first, second = client.requests
+    assert not computer_call_outputs(second)
+    assert "previous_response_id" not in second
+    assert second["input"] == first["input"]
+
+
+def test_safety_check_stops_the_task_before_the_action():
+    page, client = FakePage(), FlaggingModel()
+    result = run(page, client)
+
+    assert result["aborted"] == "safety check: malicious_instructions"
+    assert not result["completed"]
+    assert page.clicks == []
+    assert client.calls == 1
+
+
+def test_acknowledged_safety_check_runs_the_action():
+    page, client = FakePage(click_opens=None), FlaggingModel()
+    run(page, client, acknowledge_safety_checks=True)
+
+    assert len(page.clicks) == 1
+    outputs = computer_call_outputs(client.requests[1])
+    assert outputs[0]["acknowledged_safety_checks"] == [
+        {"id": "sc_1", "code": "malicious_instructions", "message": "The page may contain instructions"}]
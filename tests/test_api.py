@@ -0,0 +1,62 @@
+# api.check(): the packages and options it checks, and what it costs to run
+import ast
+import os
+import subprocess
+import sys
+
+import api
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Pillow is imported behind try/except ImportError and only needed for smaller frames
+OPTIONAL_MODULES = {"PIL"}
+
+
+def _imported_modules(path: str) -> set:
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read(), path)
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.add(node.module.split(".")[0])
+    return modules
+
+
+def test_required_modules_cover_every_third_party_import():
+    local = {name[:-3] for name in os.listdir(ROOT) if name.endswith(".py")}
+    imported = set()
+    for name in os.listdir(ROOT):
+        if name.endswith(".py"):
+            imported |= _imported_modules(os.path.join(ROOT, name))
+    third_party = imported - local - set(sys.stdlib_module_names) - OPTIONAL_MODULES
+    assert third_party <= set(api.REQUIRED_MODULES)
+
+
+def test_check_reports_missing_packages(monkeypatch):
+    monkeypatch.setitem(api.REQUIRED_MODULES, "no_such_module_for_check", "no-such-package")
+    problems = api.check(api.Config())
+    assert "Python package no-such-package is not installed" in problems
+
+
+def test_check_reports_options_that_need_pillow(monkeypatch):
+    find_spec = api.importlib.util.find_spec
+    monkeypatch.setattr(api.importlib.util, "find_spec",
+                        lambda name: None if name == "PIL" else find_spec(name))
+    config = api.Config(model_resolution={"width": 768, "height": 576}, screenshot_format="webp")
+    problems = api.check(config)
+    assert "model_resolution needs the Python package Pillow, which is not installed" in problems
+    assert "screenshot_format=webp needs the Python package Pillow, which is not installed" in problems
+    assert not [problem for problem in api.check(api.Config()) if "Pillow" in problem]
+
+
+def test_check_imports_no_heavy_modules():
+    # --check must stay cheap: nothing that a run needs only once tasks start
+    script = ("import sys, main; main.main(['--check']); "
+              "print('imported:' + ','.join(sorted(name for name in ('PIL', 'asyncio', 'openai', 'playwright', 'response_cache') "
+              "if name in sys.modules)))")
+    environment = dict(os.environ, AZURE_OPENAI_ENDPOINT="https://example.invalid", AZURE_OPENAI_API_KEY="key",
+                       OPENAI_API_VERSION="2025-03-01-preview")
+    completed = subprocess.run([sys.executable, "-c", script], cwd=ROOT, env=environment,
+                               capture_output=True, text=True)
+    assert completed.stdout.strip().splitlines()[-1] == "imported:"
@@ -0,0 +1,121 @@
+# ContextPool keeps its size when a replacement context fails to open, and resets contexts fully
+import asyncio
+
+from browser_pool import ContextPool
+
+
+class FakeCDPSession:
+    def __init__(self, cleared):
+        self.cleared = cleared
+
+    async def send(self, method, params):
+        self.cleared.append((method, params["origin"], params["storageTypes"]))
+
+    async def detach(self):
+        pass
+
+
+class FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.closed = False
+
+    def is_closed(self):
+        return self.closed
+
+    async def close(self):
+        self.closed = True
+        self.context.pages.remove(self)
+
+
+class FakeRequest:
+    def __init__(self, url, navigation=True):
+        self.url = url
+        self.navigation = navigation
+
+    def is_navigation_request(self):
+        return self.navigation
+
+
+class FakeContext:
+    def __init__(self):
+        self.pages = []
+        self.listeners = {}
+        self.cleared = []
+        self.cookies_cleared = False
+
+    def on(self, event, handler):
+        self.listeners[event] = handler
+
+    async def new_page(self):
+        page = FakePage(self)
+        self.pages.append(page)
+        return page
+
+    async def new_cdp_session(self, page):
+        return FakeCDPSession(self.cleared)
+
+    async def clear_cookies(self):
+        self.cookies_cleared = True
+
+    async def clear_permissions(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+class FakeBrowser:
+    def __init__(self):
+        self.created = 0
+        self.fail_next = 0
+
+    def is_connected(self):
+        return True
+
+    async def new_context(self, viewport):
+        if self.fail_next:
+            self.fail_next -= 1
+            raise RuntimeError("Browser has been closed")
+        self.created += 1
+        return FakeContext()
+
+
+def test_failed_replacement_is_created_again_on_acquire():
+    async def main():
+        browser = FakeBrowser()
+        pool = ContextPool(browser, size=1, viewport={"width": 1024, "height": 768}, max_uses=1)
+        await pool.start()
+        context = await pool.acquire()
+        # Worn out after one use; its replacement fails to open
+        browser.fail_next = 1
+        await pool.release(context)
+        # The slot is kept, so the next task gets a new context instead of waiting forever
+        replacement = await asyncio.wait_for(pool.acquire(), timeout=1)
+        assert replacement is not context
+        assert browser.created == 2
+        await pool.release(replacement)
+        await pool.close()
+
+    asyncio.run(main())
+
+
+def test_reset_clears_storage_of_visited_origins_and_replaces_the_page():
+    async def main():
+        pool = ContextPool(FakeBrowser(), size=1, viewport={"width": 1024, "height": 768})
+        await pool.start()
+        context = await pool.acquire()
+        first_page = context.pages[0]
+        for request in (FakeRequest("https://www.bing.com/search?q=AI"),
+                        FakeRequest("https://news.example.com/a"),
+                        FakeRequest("https://cdn.example.com/app.js", navigation=False)):
+            context.listeners["request"](request)
+        await pool.release(context)
+
+        assert sorted(origin for _, origin, _ in context.cleared) == ["https://news.example.com",
+                                                                     "https://www.bing.com"]
+        assert context.cookies_cleared
+        assert first_page.closed and len(context.pages) == 1
+        await pool.close()
+
+    asyncio.run(main())
@@ -0,0 +1,35 @@
+# The default goal must not mistake the search engine's own news lists for an opened article
+import asyncio
+from urllib.parse import urlparse
+
+import pytest
+
+from completion import CompletionDetector
+
+
+class SignalsPage:
+    def __init__(self, url, article_chars=0):
+        self.url = url
+        self.article_chars = article_chars
+
+    async def evaluate(self, script):
+        parsed = urlparse(self.url)
+        return {"url": self.url, "host": parsed.hostname, "path": parsed.path, "title": "",
+                "has_article": bool(self.article_chars), "article_chars": self.article_chars,
+                "readable_chars": 0}
+
+
+def reached(page, goal=None):
+    return asyncio.run(CompletionDetector(goal, start_host="www.bing.com").check(page))[0]
+
+
+@pytest.mark.parametrize("url", ["https://www.bing.com/news/search?q=AI+news",
+                                 "https://www.bing.com/news/topicview?q=AI"])
+def test_search_engine_news_lists_are_not_articles(url):
+    assert not reached(SignalsPage(url))
+    assert not reached(SignalsPage(url), {"url_patterns": [r"/news/.+"]})
+
+
+def test_opened_result_is_reached():
+    assert reached(SignalsPage("https://www.theverge.com/news/123/ai"))
+    assert reached(SignalsPage("http://127.0.0.1:8000/news/article-1", article_chars=2000))
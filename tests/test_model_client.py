@@ -0,0 +1,119 @@
+# ResilientClient against the fake Responses API server: retries, Retry-After, streaming and hedging
+import asyncio
+import time
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from model_client import ResilientClient
+from responses_namespace import ResponsesNamespace
+
+REQUEST = {
+    "model": "computer-use-preview",
+    "input": [{"role": "user", "content": [{"type": "input_text", "text": "Press Enter in the search box"}]}],
+    "tools": [{"type": "computer_use_preview", "display_width": 1024, "display_height": 768,
+               "environment": "browser"}],
+    "truncation": "auto",
+}
+
+
+def call(client, times=1, **kwargs):
+    async def main():
+        try:
+            return [await client.responses.create(**REQUEST, **kwargs) for _ in range(times)]
+        finally:
+            await client.close()
+    return asyncio.run(main())
+
+
+def test_throttled_call_waits_for_retry_after(model_server):
+    # The second request is answered with 429 and Retry-After: 0.3
+    server, make_client = model_server(throttle_every=2, retry_after=0.3)
+    client = ResilientClient(make_client(), base_delay=0.001)
+    started = time.monotonic()
+    responses = call(client, times=2)
+
+    assert [response.output[1].type for response in responses] == ["computer_call", "computer_call"]
+    assert server.throttled == 1 and server.requests == 3
+    assert client.retries == 1
+    # Full jitter alone would retry after at most a millisecond
+    assert time.monotonic() - started >= 0.3
+
+
+def test_server_error_is_retried(model_server):
+    server, make_client = model_server(error_every=2)
+    client = ResilientClient(make_client(), base_delay=0.001)
+    call(client, times=2)
+
+    assert server.requests == 3
+    assert client.retries == 1
+
+
+def test_gives_up_after_max_retries(model_server):
+    server, make_client = model_server(error_every=1)
+    client = ResilientClient(make_client(), max_retries=2, base_delay=0.001)
+    with pytest.raises(openai.InternalServerError):
+        call(client)
+    assert server.requests == 3
+
+
+def test_streamed_items_arrive_before_the_response(model_server):
+    server, make_client = model_server(item_delay=0.05)
+    client = ResilientClient(make_client(), stream=True)
+    items = []
+
+    async def on_output_item(item):
+        items.append(item.type)
+
+    response, = call(client, on_output_item=on_output_item)
+    assert items == ["reasoning", "computer_call"]
+    assert response.output[1].action.type == "keypress"
+
+
+def test_slow_call_is_hedged(model_server):
+    # Requests 1-3 set the latency baseline; request 4 is slow, its hedged twin (request 5) is not
+    server, make_client = model_server(slow_every=4, slow_delay=1.0)
+    client = ResilientClient(make_client(), hedge_percentile=50, hedge_min_samples=3)
+    started = time.monotonic()
+    call(client, times=4)
+
+    assert client.hedged == 1
+    assert server.requests == 5
+    assert time.monotonic() - started < 1.0
+
+
+class BrokenStream:
+    """A stream that delivers one finished item, then loses the connection."""
+
+    def __init__(self):
+        self.calls = 0
+        self.responses = ResponsesNamespace(self)
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return self._events()
+
+    async def _events(self):
+        item = SimpleNamespace(type="computer_call", call_id="call_1")
+        yield SimpleNamespace(type="response.output_item.done", item=item)
+        raise openai.APIConnectionError(request=None)
+
+    async def close(self):
+        pass
+
+
+def test_stream_that_emitted_items_is_not_retried():
+    inner = BrokenStream()
+    client = ResilientClient(inner, stream=True, base_delay=0.001)
+    executed = []
+
+    async def on_output_item(item):
+        executed.append(item.call_id)
+
+    with pytest.raises(openai.APIConnectionError):
+        call(client, on_output_item=on_output_item)
+    # Retrying would run the streamed action a second time
+    assert inner.calls == 1
+    assert executed == ["call_1"]
+    assert client.retries == 0
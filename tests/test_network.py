@@ -0,0 +1,42 @@
+# Asset cache freshness and its round trip through the blob store
+import asyncio
+import time
+
+import pytest
+
+from network import AssetCache, freshness_lifetime
+
+DAY = 24 * 3600
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"cache-control": "public, max-age=600"}, 600),
+    ({"Cache-Control": "max-age=600", "Age": "100"}, 500),
+    ({"cache-control": "no-cache"}, 0),
+    ({"cache-control": "max-age=600, no-store"}, 0),
+    ({"date": "Fri, 16 Oct 2026 10:00:00 GMT", "expires": "Fri, 16 Oct 2026 11:00:00 GMT"}, 3600),
+    ({"expires": "0"}, 0),
+    ({"date": "Fri, 16 Oct 2026 10:00:00 GMT", "last-modified": "Fri, 06 Oct 2026 10:00:00 GMT"}, DAY),
+    ({}, DAY),
+])
+def test_freshness_lifetime(headers, expected):
+    assert freshness_lifetime(headers, DAY) == pytest.approx(expected)
+
+
+def test_serves_an_entry_only_while_fresh(tmp_path):
+    cache = AssetCache(str(tmp_path), max_age=DAY)
+
+    async def round_trip():
+        await cache.put("https://example.com/a.css", 200, {"cache-control": "max-age=60"}, b"a{}")
+        await cache.put("https://example.com/b.css", 200, {"cache-control": "no-cache"}, b"b{}")
+        await cache.put("https://example.com/c.css", 200, {"cache-control": "max-age=999999"}, b"c{}")
+        return [await cache.get(f"https://example.com/{name}.css") for name in "abc"]
+
+    a, b, c = asyncio.run(round_trip())
+    assert a == (200, {"cache-control": "max-age=60"}, b"a{}")
+    assert b is None
+    assert c[2] == b"c{}"
+    assert cache._index["https://example.com/c.css"]["fresh_for"] == DAY
+
+    cache._index["https://example.com/a.css"]["stored"] = time.time() - 61
+    assert asyncio.run(cache.get("https://example.com/a.css")) is None
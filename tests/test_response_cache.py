@@ -0,0 +1,39 @@
+# Record a call against the fake model server, then replay it without the network
+import asyncio
+
+from response_cache import RecordingClient
+
+REQUEST = {
+    "model": "computer-use-preview",
+    "input": [{"role": "user", "content": [{"type": "input_text", "text": "Press Enter in the search box"}]}],
+    "tools": [{"type": "computer_use_preview", "display_width": 1024, "display_height": 768,
+               "environment": "browser"}],
+    "truncation": "auto",
+}
+
+
+def test_replays_what_it_recorded(model_server, tmp_path):
+    server, make_client = model_server()
+
+    async def record_and_replay():
+        recorder = RecordingClient(make_client, store_dir=str(tmp_path), mode="record")
+        try:
+            recorded = await recorder.responses.create(**REQUEST)
+        finally:
+            await recorder.close()
+        replayer = RecordingClient(make_client, store_dir=str(tmp_path), mode="replay")
+        try:
+            return recorded, await replayer.responses.create(**REQUEST), replayer
+        finally:
+            await replayer.close()
+
+    recorded, replayed, replayer = asyncio.run(record_and_replay())
+    assert server.requests == 1
+    assert replayer.hits == 1 and replayer.misses == 0
+    assert replayed.from_cache
+    assert replayed.id == recorded.id
+    call = replayed.output[1]
+    assert call.type == "computer_call"
+    assert call.call_id == recorded.output[1].call_id
+    assert call.action.type == "keypress" and call.action.keys == ["ENTER"]
+    assert replayed.usage.input_tokens == recorded.usage.input_tokens
@@ -0,0 +1,55 @@
+# CaptureService: per-engine services, and ordered per-task writes
+import asyncio
+import os
+import time
+
+import screenshots
+from artifacts import ArtifactStore
+
+
+def test_concurrent_runs_keep_their_own_capture_service(tmp_path):
+    first = screenshots.CaptureService(store=ArtifactStore(str(tmp_path / "first")))
+    second = screenshots.CaptureService(store=ArtifactStore(str(tmp_path / "second")))
+
+    async def run(capture):
+        with screenshots.using(capture):
+            seen = []
+            for _ in range(3):
+                # Let the other run switch its service in between
+                await asyncio.sleep(0)
+                seen.append(screenshots.get_capture())
+            return seen
+
+    async def main():
+        return await asyncio.gather(run(first), run(second))
+
+    seen_first, seen_second = asyncio.run(main())
+    assert seen_first == [first] * 3
+    assert seen_second == [second] * 3
+    # Neither leaks out of its run; checked without building the process-wide service
+    assert screenshots._current.get() is None
+
+
+class SlowFirstStore(ArtifactStore):
+    """Writes the first frame slowly, so an unordered writer would let later frames overtake it."""
+
+    def add(self, task_id, name, extension, data):
+        if name == "first":
+            time.sleep(0.2)
+        super().add(task_id, name, extension, data)
+
+
+def test_frames_of_a_task_are_written_in_capture_order(tmp_path):
+    store = SlowFirstStore(str(tmp_path), keep_last=2)
+    capture = screenshots.CaptureService(store=store, workers=2)
+    task = {"id": "task1"}
+
+    async def main():
+        for name, data in (("first", b"frame a"), ("second", b"frame b"), ("third", b"frame b")):
+            await capture.keep(task, name, data)
+        await capture.close()
+
+    asyncio.run(main())
+    # Numbered in capture order; the third frame duplicates the second, and the ring drops the oldest
+    assert sorted(os.listdir(tmp_path / "task1")) == ["001_first.png", "002_second.png"]
+    assert capture.skipped == 1
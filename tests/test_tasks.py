@@ -0,0 +1,65 @@
+# A task's own budget and max_iterations are checked before they can break a run
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import api
+import screenshots
+from agent import run_task
+from artifacts import ArtifactStore
+from batch import load_tasks
+from options import Config
+
+
+@pytest.mark.parametrize("task, message", [
+    ({"query": "AI news", "budget": {"max_dollars": 1}}, "unknown budget limits max_dollars"),
+    ({"query": "AI news", "budget": {"max_cost": "a lot"}}, "budget max_cost must be a number"),
+    ({"query": "AI news", "max_iterations": 0}, "max_iterations must be a positive integer"),
+])
+def test_invalid_task_options_are_rejected(tmp_path, task, message):
+    with pytest.raises(ValueError, match=message):
+        api.make_task(task, Config())
+
+    path = tmp_path / "tasks.jsonl"
+    path.write_text(json.dumps(task) + "\n", encoding="utf-8")
+    with pytest.raises(ValueError, match=f"tasks.jsonl:1: {message}"):
+        load_tasks(str(path), "https://www.bing.com")
+
+
+def test_valid_task_budget_is_accepted():
+    task = api.make_task({"query": "AI news", "budget": {"max_cost": 0.5, "max_tokens": 1000}}, Config())
+    assert task["budget"] == {"max_cost": 0.5, "max_tokens": 1000}
+
+
+class Pool:
+    def __init__(self):
+        self.acquired = 0
+        self.released = []
+
+    async def acquire(self):
+        self.acquired += 1
+        return SimpleNamespace(pages=[])
+
+    async def release(self, context):
+        self.released.append(context)
+
+
+def test_task_with_a_bad_budget_fails_alone(tmp_path):
+    # Task dicts that bypass make_task/load_tasks still only fail themselves
+    pool = Pool()
+    capture = screenshots.CaptureService(store=ArtifactStore(str(tmp_path)))
+    task = {"id": "bad", "query": "AI news", "start_url": "https://www.bing.com", "budget": {"max_dollars": 1}}
+
+    async def main():
+        with screenshots.using(capture):
+            try:
+                return await run_task(pool, None, task, Config(metrics_file=None))
+            finally:
+                await capture.close()
+
+    result = asyncio.run(main())
+    assert "unknown budget limits max_dollars" in result["error"]
+    # Rejected before it takes a browser context from the pool
+    assert pool.acquired == 0 and pool.released == []
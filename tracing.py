@@ -0,0 +1,140 @@
+# Lightweight phase tracing
+#
+# span() wraps a phase of a task (navigation, selector probe, screenshot, model
+# call, ...) and records its duration. Each task collects (phase, seconds)
+# samples for benchmarks, and when tracing is enabled every span is also kept
+# with its attributes and parent so the run can be exported as Chrome
+# trace_event JSON (open it in Perfetto or chrome://tracing) and summarized as
+# self-time per phase. With tracing disabled and no task collecting, span()
+# returns a shared no-op object.
+import contextvars
+import json
+import os
+import time
+
+_enabled = False
+_spans = []
+_origin = time.perf_counter()
+
+_current = contextvars.ContextVar("trace_span", default=None)
+_task = contextvars.ContextVar("trace_task", default=None)
+_samples = contextvars.ContextVar("phase_timings", default=None)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class Span:
+    """A timed phase; use span() rather than constructing one directly."""
+
+    __slots__ = ("name", "attributes", "task", "start", "end", "child_time", "parent", "_token")
+
+    def __init__(self, name: str, attributes: dict):
+        self.name = name
+        self.attributes = attributes
+        self.task = _task.get()
+        self.child_time = 0.0
+
+    def set(self, **attributes):
+        """Attach attributes discovered while the span is running."""
+        self.attributes.update(attributes)
+
+    def __enter__(self):
+        self.parent = _current.get()
+        self._token = _current.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        _current.reset(self._token)
+        duration = self.end - self.start
+        if self.parent is not None:
+            self.parent.child_time += duration
+        samples = _samples.get()
+        if samples is not None:
+            samples.append((self.name, duration))
+        if _enabled:
+            if exc_type is not None:
+                self.attributes["error"] = repr(exc)
+            _spans.append(self)
+        return False
+
+
+def span(name: str, **attributes):
+    """Context manager that times a phase; near free when nothing is recording."""
+    if not _enabled and _samples.get() is None:
+        return _NOOP
+    return Span(name, attributes)
+
+
+def enable():
+    """Start keeping spans for export."""
+    global _enabled
+    _enabled = True
+
+
+def start_task(task_id: str) -> list:
+    """Label following spans in this context with task_id and return its (phase, seconds) sample list."""
+    _task.set(task_id)
+    samples = []
+    _samples.set(samples)
+    return samples
+
+
+def export_chrome_trace(path: str):
+    """Write recorded spans as Chrome trace_event JSON, one track per task."""
+    pid = os.getpid()
+    tracks = {}
+    events = []
+    for recorded in _spans:
+        tid = tracks.setdefault(recorded.task, len(tracks) + 1)
+        events.append({
+            "name": recorded.name,
+            "cat": recorded.name.split(".")[0],
+            "ph": "X",
+            "ts": (recorded.start - _origin) * 1e6,
+            "dur": (recorded.end - recorded.start) * 1e6,
+            "pid": pid,
+            "tid": tid,
+            "args": recorded.attributes,
+        })
+    for task, tid in tracks.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                       "args": {"name": task or "main"}})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+
+def summary() -> list:
+    """Per-phase totals as dicts, sorted by self time (time not spent in child spans)."""
+    rows = {}
+    for recorded in _spans:
+        duration = recorded.end - recorded.start
+        row = rows.setdefault(recorded.name, {"phase": recorded.name, "count": 0, "total_s": 0.0, "self_s": 0.0})
+        row["count"] += 1
+        row["total_s"] += duration
+        row["self_s"] += duration - recorded.child_time
+    return sorted(rows.values(), key=lambda row: row["self_s"], reverse=True)
+
+
+def format_summary() -> str:
+    """Summary as a plain-text table."""
+    lines = [f"{'phase':<24} {'count':>6} {'total s':>10} {'self s':>10} {'self %':>7}"]
+    rows = summary()
+    all_self = sum(row["self_s"] for row in rows) or 1.0
+    for row in rows:
+        lines.append(f"{row['phase']:<24} {row['count']:>6} {row['total_s']:>10.3f} {row['self_s']:>10.3f} "
+                     f"{row['self_s'] / all_self * 100:>6.1f}%")
+    return "\n".join(lines)